@@ -0,0 +1,319 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from budget_app import Category, ConcurrentCategory, Ledger
+from budget_service import BudgetService
+
+
+class RecomputingCategory(Category):
+    """
+    Category that sums the whole ledger on every balance check, like the
+    original implementation. Only used as a baseline.
+    """
+
+    def get_balance(self, verify=False):
+        return super().get_balance(verify=True)
+
+
+class GlobalLockCategory(ConcurrentCategory):
+    """
+    ConcurrentCategory where every instance shares one lock. Only used as a
+    baseline for the per-category locks.
+    """
+    _global_lock = threading.RLock()
+
+    def __init__(self, name, journal=None, snapshot_every=10000):
+        super().__init__(name, journal, snapshot_every)
+        self._lock = self._global_lock
+
+
+def make_transactions(num_transactions, seed=0):
+    """
+    Generates a random sequence of ledger operations.
+
+    Parameters:
+        num_transactions (int): The number of operations to generate.
+        seed (int, optional): The seed for the random generator. Defaults to 0.
+
+    Returns:
+        list: Tuples with the operation name, the amount and the description.
+    """
+    rng = random.Random(seed)
+    operations = []
+    for i in range(num_transactions):
+        operation = rng.choice(('deposit', 'withdraw', 'withdraw', 'transfer'))
+        amount = round(rng.uniform(1, 100), 2)
+        operations.append((operation, amount, f'item {i % 500}'))
+    return operations
+
+def replay(category_class, operations):
+    """
+    Replays a sequence of ledger operations on a new category.
+
+    Parameters:
+        category_class (type): The Category class to instantiate.
+        operations (list): Tuples as returned by make_transactions.
+
+    Returns:
+        tuple: The replayed category and the elapsed time in seconds.
+    """
+    category = category_class('Food')
+    other = category_class('Savings')
+    start = time.perf_counter()
+    for operation, amount, description in operations:
+        if operation == 'deposit':
+            category.deposit(amount, description)
+        elif operation == 'withdraw':
+            category.withdraw(amount, description)
+        else:
+            category.transfer(amount, other)
+    return (category, time.perf_counter() - start)
+
+def benchmark_replay(num_transactions, baseline_limit=20_000):
+    """
+    Measures ledger replay with the running balance and, for small ledgers,
+    with the ledger-summing baseline.
+
+    Parameters:
+        num_transactions (int): The number of operations to replay.
+        baseline_limit (int, optional): The largest size the quadratic
+            baseline is run for. Defaults to 20000.
+    """
+    operations = make_transactions(num_transactions)
+    category, elapsed = replay(Category, operations)
+    category.get_balance(verify=True)
+    line = f'replay  entries={num_transactions:>9}  running={elapsed:.3f}s'
+    if num_transactions <= baseline_limit:
+        baseline, baseline_elapsed = replay(RecomputingCategory, operations)
+        assert baseline.get_balance() == category.get_balance()
+        line += f'  recompute={baseline_elapsed:.3f}s  speedup={baseline_elapsed / elapsed:.1f}x'
+    print(line)
+
+def benchmark_memory(num_transactions):
+    """
+    Compares the memory taken by a Ledger and by a list of dicts.
+
+    Parameters:
+        num_transactions (int): The number of entries to store.
+    """
+    operations = make_transactions(num_transactions)
+    tracemalloc.start()
+    entries = [{'amount': amount, 'description': description} for _, amount, description in operations]
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    del entries
+    tracemalloc.stop()
+    tracemalloc.start()
+    ledger = Ledger()
+    for _, amount, description in operations:
+        ledger.append(amount, description)
+    ledger_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'memory  entries={num_transactions:>9}  dicts={dict_bytes / num_transactions:.0f}B/entry  '
+          f'ledger={ledger_bytes / num_transactions:.0f}B/entry')
+
+def benchmark_journal(num_transactions):
+    """
+    Measures writing a journal and restoring a category from it, compared
+    with replaying every operation.
+
+    Parameters:
+        num_transactions (int): The number of operations to write.
+    """
+    operations = make_transactions(num_transactions)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'food')
+        start = time.perf_counter()
+        category = Category('Food', journal=path)
+        other = Category('Savings')
+        for operation, amount, description in operations:
+            if operation == 'deposit':
+                category.deposit(amount, description)
+            elif operation == 'withdraw':
+                category.withdraw(amount, description)
+            else:
+                category.transfer(amount, other)
+        category.close()
+        write_time = time.perf_counter() - start
+        start = time.perf_counter()
+        restored = Category('Food', journal=path)
+        load_time = time.perf_counter() - start
+        restored.close()
+    _, replay_time = replay(Category, operations)
+    assert restored.get_balance() == category.get_balance()
+    print(f'journal  entries={num_transactions:>9}  write={write_time:.3f}s  '
+          f'load={load_time:.4f}s  replay={replay_time:.3f}s')
+
+def benchmark_bulk(num_transactions):
+    """
+    Compares withdraw_many against calling withdraw once per amount.
+
+    Parameters:
+        num_transactions (int): The number of withdrawals.
+    """
+    operations = make_transactions(num_transactions)
+    amounts = [amount for _, amount, _ in operations]
+    descriptions = [description for _, _, description in operations]
+    single = Category('Food')
+    single.deposit(num_transactions * 25)
+    start = time.perf_counter()
+    for amount, description in zip(amounts, descriptions):
+        single.withdraw(amount, description)
+    loop_time = time.perf_counter() - start
+    bulk = Category('Food')
+    bulk.deposit(num_transactions * 25)
+    start = time.perf_counter()
+    bulk.withdraw_many(amounts, descriptions)
+    bulk_time = time.perf_counter() - start
+    assert str(bulk) == str(single)
+    print(f'bulk  entries={num_transactions:>9}  withdraw={loop_time:.3f}s  '
+          f'withdraw_many={bulk_time:.3f}s  speedup={loop_time / bulk_time:.1f}x')
+
+def benchmark_threads(category_class, num_threads, transfers_per_thread, num_categories=64, journal_dir=None):
+    """
+    Runs random transfers between categories from several threads.
+
+    Parameters:
+        category_class (type): The ConcurrentCategory class to use.
+        num_threads (int): The number of threads.
+        transfers_per_thread (int): The number of transfers each thread makes.
+        num_categories (int, optional): The number of categories. Defaults to 64.
+        journal_dir (str, optional): If given, every category keeps a journal
+            there and both categories of a transfer are flushed to the device
+            with flush(sync=True) before the next one. Defaults to None.
+
+    Returns:
+        float: The number of transfers per second.
+    """
+    categories = []
+    for i in range(num_categories):
+        journal = None if journal_dir is None else os.path.join(journal_dir, f'{category_class.__name__}-{i}')
+        categories.append(category_class(f'Category {i}', journal=journal))
+    for category in categories:
+        category.deposit(1000, 'initial deposit')
+
+    def work(seed):
+        rng = random.Random(seed)
+        for _ in range(transfers_per_thread):
+            source, target = rng.sample(categories, 2)
+            source.transfer(rng.randint(1, 200), target)
+            if journal_dir is not None:
+                source.flush(sync=True)
+                target.flush(sync=True)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(num_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    assert sum(category.get_balance(verify=True) for category in categories) == 1000 * num_categories
+    assert all(category.get_balance() >= 0 for category in categories)
+    for category in categories:
+        category.close()
+    return num_threads * transfers_per_thread / elapsed
+
+def benchmark_concurrency(transfers_per_thread, max_threads=8, durable_transfers_per_thread=200):
+    """
+    Compares transfer throughput with per-category locks and with one global lock.
+
+    In memory, transfers only run Python code, so the GIL serializes them
+    whatever the locks. With durable transfers, every transfer waits for
+    os.fsync, which releases the GIL: per-category locks let other threads
+    keep working on other categories meanwhile, while one global lock makes
+    them all wait.
+
+    Parameters:
+        transfers_per_thread (int): The number of in-memory transfers each
+            thread makes.
+        max_threads (int, optional): The largest number of threads. Defaults to 8.
+        durable_transfers_per_thread (int, optional): The number of durable
+            transfers each thread makes. Defaults to 200.
+    """
+    for label, count, durable in (('memory', transfers_per_thread, False),
+                                  ('fsync', durable_transfers_per_thread, True)):
+        num_threads = 1
+        while num_threads <= max_threads:
+            with tempfile.TemporaryDirectory() as directory:
+                journal_dir = directory if durable else None
+                per_category = benchmark_threads(ConcurrentCategory, num_threads, count, journal_dir=journal_dir)
+                global_lock = benchmark_threads(GlobalLockCategory, num_threads, count, journal_dir=journal_dir)
+            print(f'threads={num_threads:>2}  {label:<6}  per-category={per_category:>10.0f} transfers/s  '
+                  f'global={global_lock:>10.0f} transfers/s')
+            num_threads *= 2
+
+async def _run_service_clients(num_clients, requests_per_client, journal_dir):
+    """
+    Starts a BudgetService on a free localhost port and drives it with clients.
+
+    Parameters:
+        num_clients (int): The number of concurrent connections.
+        requests_per_client (int): The number of requests each client sends.
+        journal_dir (str or None): Where the service keeps its journals.
+
+    Returns:
+        tuple: The latency of every request in seconds and the elapsed time.
+    """
+    service = BudgetService(journal_dir)
+    server = await service.start_tcp('127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    latencies = []
+
+    async def client(number):
+        rng = random.Random(number)
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        name = f'Category {number % 8}'
+        for i in range(requests_per_client):
+            operation = rng.choice(('deposit', 'withdraw', 'withdraw', 'balance'))
+            request = {'id': i, 'op': operation, 'category': name, 'amount': round(rng.uniform(1, 100), 2)}
+            start = time.perf_counter()
+            writer.write(json.dumps(request).encode() + b'\n')
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - start)
+            assert response['ok'], response
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(num_clients)))
+    elapsed = time.perf_counter() - start
+    server.close()
+    await server.wait_closed()
+    await service.close()
+    return (latencies, elapsed)
+
+def benchmark_service(num_clients=32, requests_per_client=500):
+    """
+    Reports latency percentiles and throughput of the budget service.
+
+    Parameters:
+        num_clients (int, optional): The number of concurrent connections.
+            Defaults to 32.
+        requests_per_client (int, optional): The number of requests each
+            client sends. Defaults to 500.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        latencies, elapsed = asyncio.run(_run_service_clients(num_clients, requests_per_client, directory))
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f'service  clients={num_clients:>3}  requests={len(latencies):>7}  p50={p50:.2f}ms  '
+          f'p99={p99:.2f}ms  throughput={len(latencies) / elapsed:.0f} requests/s')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        benchmark_replay(size)
+    benchmark_memory(max(sizes))
+    benchmark_journal(max(sizes))
+    benchmark_bulk(max(sizes))
+    benchmark_concurrency(max(sizes) // 100)
+    benchmark_service()
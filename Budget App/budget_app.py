@@ -1,16 +1,778 @@
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Sequence
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import accumulate, count, repeat
+
+_AMOUNT = struct.Struct('=d')
+_DESCRIPTION_ID = struct.Struct('=I')
+_LENGTH = struct.Struct('<I')
+_SNAPSHOT = struct.Struct('<Qdd')
+_COMMITTED = struct.Struct('<Q')
+
+CHART_CACHE_SIZE = 128
+
+_lock_order = count()
+
+NAN = float('nan')
+
+
+class Ledger(Sequence):
+
+    def __init__(self):
+        """
+        Initializes an empty Ledger.
+
+        Entries are stored column by column: amounts and timestamps in arrays
+        of doubles (NaN for entries without a timestamp) and descriptions as
+        indexes into a table of distinct descriptions, which takes 20 bytes
+        per entry instead of one dict per entry.
+        """
+        self._amounts = array('d')
+        self._timestamps = array('d')
+        self._description_ids = array('I')
+        self._descriptions = []
+        self._description_index = {}
+
+    def append(self, amount, description, timestamp=NAN):
+        """
+        Appends an entry to the ledger.
+
+        Parameters:
+            amount (int or float): The signed amount of the entry.
+            description (str): The description of the entry.
+            timestamp (float, optional): The POSIX timestamp of the entry.
+                Defaults to NaN (no timestamp).
+
+        Returns:
+            int: The index of the description in the description table.
+        """
+        description_id = self._description_index.get(description)
+        if description_id is None:
+            description_id = len(self._descriptions)
+            self._descriptions.append(description)
+            self._description_index[description] = description_id
+        self._amounts.append(amount)
+        self._timestamps.append(timestamp)
+        self._description_ids.append(description_id)
+        return description_id
+
+    def extend(self, amounts, descriptions, timestamps=None):
+        """
+        Appends many entries to the ledger in one operation.
+
+        Parameters:
+            amounts (iterable): The signed amounts of the entries.
+            descriptions (iterable): The descriptions of the entries, one per amount.
+            timestamps (iterable, optional): The POSIX timestamps of the
+                entries, one per amount. Defaults to no timestamps.
+
+        Returns:
+            list: The descriptions added to the description table by this
+                call, in table order.
+        """
+        index = self._description_index
+        first_new = len(self._descriptions)
+        description_ids = []
+        for description in descriptions:
+            description_id = index.get(description)
+            if description_id is None:
+                description_id = len(self._descriptions)
+                self._descriptions.append(description)
+                index[description] = description_id
+            description_ids.append(description_id)
+        self._amounts.extend(amounts)
+        self._description_ids.extend(description_ids)
+        if timestamps is None:
+            timestamps = repeat(NAN, len(self._amounts) - len(self._timestamps))
+        self._timestamps.extend(timestamps)
+        return self._descriptions[first_new:]
+
+    @classmethod
+    def from_columns(cls, amounts, description_ids, descriptions, timestamps=None):
+        """
+        Creates a Ledger from already built columns, without touching every entry.
+
+        Parameters:
+            amounts (array): The amounts as an array of doubles.
+            description_ids (array): The description indexes as an array('I').
+            descriptions (list): The description table.
+            timestamps (array, optional): The timestamps as an array of
+                doubles. Defaults to no timestamps.
+
+        Returns:
+            Ledger: A ledger that takes ownership of the given columns.
+        """
+        ledger = cls()
+        ledger._amounts = amounts
+        if timestamps is None:
+            timestamps = array('d', repeat(NAN, len(amounts)))
+        ledger._timestamps = timestamps
+        ledger._description_ids = description_ids
+        ledger._descriptions = descriptions
+        ledger._description_index = {description: i for i, description in enumerate(descriptions)}
+        return ledger
+
+    def amounts(self):
+        """
+        Returns the amounts column.
+
+        Returns:
+            memoryview: A read-only view of the amounts as doubles.
+        """
+        return memoryview(self._amounts).toreadonly()
+
+    def timestamps(self):
+        """
+        Returns the timestamps column.
+
+        Returns:
+            memoryview: A read-only view of the timestamps as doubles, NaN
+                for entries without a timestamp.
+        """
+        return memoryview(self._timestamps).toreadonly()
+
+    def description_ids(self):
+        """
+        Returns the description index column.
+
+        Returns:
+            memoryview: A read-only view of the indexes into the description table.
+        """
+        return memoryview(self._description_ids).toreadonly()
+
+    def iter_entries(self, start=0, stop=None):
+        """
+        Iterates over entries without building a dict for each one.
+
+        Parameters:
+            start (int, optional): The index of the first entry. Defaults to 0.
+            stop (int, optional): The index after the last entry. Defaults to
+                the end of the ledger.
+
+        Yields:
+            tuple: The amount and the description of every entry.
+        """
+        descriptions = self._descriptions
+        if stop is None:
+            stop = len(self._amounts)
+        for index in range(start, stop):
+            yield (self._amounts[index], descriptions[self._description_ids[index]])
+
+    def __len__(self):
+        return len(self._amounts)
+
+    def _entry(self, amount, description_id, timestamp):
+        """
+        Builds the dict of one entry.
+
+        Parameters:
+            amount (float): The amount of the entry.
+            description_id (int): The index of its description.
+            timestamp (float): Its timestamp, or NaN.
+
+        Returns:
+            dict: The entry with 'amount' and 'description' keys, plus a
+                'timestamp' key if the entry has one.
+        """
+        entry = {'amount': amount, 'description': self._descriptions[description_id]}
+        if not math.isnan(timestamp):
+            entry['timestamp'] = timestamp
+        return entry
+
+    def __getitem__(self, index):
+        """
+        Returns an entry as a dict with 'amount' and 'description' keys, and a
+        'timestamp' key for entries that have one.
+
+        The dict is built on demand, so changing it does not change the ledger.
+
+        Parameters:
+            index (int or slice): The position of the entry, or a slice.
+
+        Returns:
+            dict or list: The entry, or a list of entries for a slice.
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._entry(self._amounts[index], self._description_ids[index], self._timestamps[index])
+
+    def __iter__(self):
+        for amount, description_id, timestamp in zip(self._amounts, self._description_ids, self._timestamps):
+            yield self._entry(amount, description_id, timestamp)
+
+    def __repr__(self):
+        return f'Ledger({list(self)!r})'
+
+
+class TimeIndex:
+
+    def __init__(self):
+        """
+        Initializes an empty TimeIndex.
+
+        The index keeps the timestamps of its entries in sorted order with
+        prefix sums of their amounts and of their spending, so the totals of
+        any time range take two binary searches. Entries usually arrive in
+        time order and are appended in O(1). An entry older than the newest
+        one goes to a small sorted buffer instead, whose range is summed
+        directly at query time. When the buffer outgrows the square root of
+        the index it is merged in, so backfilling costs O(sqrt(n)) per entry
+        on average instead of a full re-sort.
+        """
+        self._times = array('d')
+        self._amounts = array('d')
+        self._spent = array('d')
+        self._amount_sums = array('d', [0])
+        self._spent_sums = array('d', [0])
+        self._late_times = array('d')
+        self._late_amounts = array('d')
+        self._late_spent = array('d')
+
+    def add(self, timestamp, amount):
+        """
+        Adds an entry to the index.
+
+        Parameters:
+            timestamp (float): The POSIX timestamp of the entry.
+            amount (float): The signed amount of the entry.
+        """
+        spent = -min(amount, 0)
+        if self._times and timestamp < self._times[-1]:
+            position = bisect_right(self._late_times, timestamp)
+            self._late_times.insert(position, timestamp)
+            self._late_amounts.insert(position, amount)
+            self._late_spent.insert(position, spent)
+            if len(self._late_times) > max(64, math.isqrt(len(self._times))):
+                self._merge()
+            return
+        self._times.append(timestamp)
+        self._amounts.append(amount)
+        self._spent.append(spent)
+        self._amount_sums.append(self._amount_sums[-1] + amount)
+        self._spent_sums.append(self._spent_sums[-1] + spent)
+
+    def _merge(self):
+        """
+        Moves the buffered late entries into the sorted arrays and rebuilds
+        the prefix sums from the first place that changed.
+        """
+        times = array('d')
+        amounts = array('d')
+        spent = array('d')
+        previous = 0
+        first = None
+        for late_time, late_amount, late_spent in zip(self._late_times, self._late_amounts, self._late_spent):
+            position = bisect_right(self._times, late_time, previous)
+            if first is None:
+                first = position
+            times.extend(self._times[previous:position])
+            amounts.extend(self._amounts[previous:position])
+            spent.extend(self._spent[previous:position])
+            times.append(late_time)
+            amounts.append(late_amount)
+            spent.append(late_spent)
+            previous = position
+        times.extend(self._times[previous:])
+        amounts.extend(self._amounts[previous:])
+        spent.extend(self._spent[previous:])
+        self._times = times
+        self._amounts = amounts
+        self._spent = spent
+        del self._amount_sums[first + 1:]
+        del self._spent_sums[first + 1:]
+        self._amount_sums.extend(accumulate(amounts[first:], initial=self._amount_sums[first]))
+        self._spent_sums.extend(accumulate(spent[first:], initial=self._spent_sums[first]))
+        del self._amount_sums[first + 1]
+        del self._spent_sums[first + 1]
+        self._late_times = array('d')
+        self._late_amounts = array('d')
+        self._late_spent = array('d')
+
+    def sums(self, start=None, end=None):
+        """
+        Returns the totals of the entries in a time range.
+
+        Parameters:
+            start (float, optional): The first timestamp included. Defaults
+                to no lower bound.
+            end (float, optional): The first timestamp excluded. Defaults to
+                no upper bound.
+
+        Returns:
+            tuple: The sum of the amounts and the total spent in the range.
+        """
+        low = 0 if start is None else bisect_left(self._times, start)
+        high = len(self._times) if end is None else bisect_left(self._times, end)
+        high = max(low, high)
+        amount_sum = self._amount_sums[high] - self._amount_sums[low]
+        spent = self._spent_sums[high] - self._spent_sums[low]
+        if self._late_times:
+            low = 0 if start is None else bisect_left(self._late_times, start)
+            high = len(self._late_times) if end is None else bisect_left(self._late_times, end)
+            if high > low:
+                amount_sum += sum(self._late_amounts[low:high])
+                spent += sum(self._late_spent[low:high])
+        return (amount_sum, spent)
+
+
+class LedgerIndex:
+
+    def __init__(self):
+        """
+        Initializes an empty LedgerIndex.
+
+        The index answers sum and spending queries by time range, exact
+        description and description prefix. It keeps a TimeIndex over all
+        timestamped entries, one TimeIndex and running totals per distinct
+        description, and the distinct descriptions in sorted order so a
+        prefix maps to a contiguous range of them.
+        """
+        self._time_index = TimeIndex()
+        self._time_by_description = {}
+        self._totals_by_description = {}
+        self._sorted_descriptions = []
+
+    def add(self, amount, description, timestamp):
+        """
+        Adds an entry to the index.
+
+        Parameters:
+            amount (float): The signed amount of the entry.
+            description (str): The description of the entry.
+            timestamp (float): The POSIX timestamp of the entry, or NaN.
+        """
+        totals = self._totals_by_description.get(description)
+        if totals is None:
+            totals = self._totals_by_description[description] = [0, 0]
+            self._time_by_description[description] = TimeIndex()
+            insort(self._sorted_descriptions, description)
+        totals[0] += amount
+        totals[1] -= min(amount, 0)
+        if not math.isnan(timestamp):
+            self._time_index.add(timestamp, amount)
+            self._time_by_description[description].add(timestamp, amount)
+
+    def _matching(self, description, prefix):
+        """
+        Returns the distinct descriptions selected by a query.
+
+        Parameters:
+            description (str or None): An exact description.
+            prefix (str or None): A description prefix.
+
+        Returns:
+            list: The matching descriptions.
+        """
+        if description is not None:
+            if description in self._totals_by_description:
+                return [description]
+            return []
+        low = bisect_left(self._sorted_descriptions, prefix)
+        high = low
+        while high < len(self._sorted_descriptions) and self._sorted_descriptions[high].startswith(prefix):
+            high += 1
+        return self._sorted_descriptions[low:high]
+
+    def sums(self, start=None, end=None, description=None, prefix=None):
+        """
+        Returns the totals of the entries selected by a query.
+
+        When start or end is given, or when there is no description filter,
+        only entries with a timestamp in the range are counted.
+
+        Parameters:
+            start (float, optional): The first timestamp included.
+            end (float, optional): The first timestamp excluded.
+            description (str, optional): Only count entries with exactly this
+                description.
+            prefix (str, optional): Only count entries whose description
+                starts with this prefix.
+
+        Returns:
+            tuple: The sum of the amounts and the total spent.
+        """
+        timed = start is not None or end is not None
+        if description is None and prefix is None:
+            return self._time_index.sums(start, end)
+        amount_sum = 0
+        spent = 0
+        for name in self._matching(description, prefix):
+            if timed:
+                name_amount, name_spent = self._time_by_description[name].sums(start, end)
+            else:
+                name_amount, name_spent = self._totals_by_description[name]
+            amount_sum += name_amount
+            spent += name_spent
+        return (amount_sum, spent)
+
+
+class Journal:
+
+    def __init__(self, path):
+        """
+        Initializes a Journal stored in files that start with the given path.
+
+        A journal is append-only and made of fixed-width column files in the
+        machine's native byte order:
+
+            path.amounts       one double per entry
+            path.timestamps    one double per entry, NaN if it has none
+            path.descriptions  one unsigned int per entry, indexing the table
+            path.strings       the description table, length-prefixed UTF-8
+            path.committed     the number of entries written by the last flush
+            path.snapshot      entry count, balance and total spent
+
+        The column files are buffered separately and may reach the disk in
+        any order, so a flush writes the committed count only after every
+        column has been flushed, and loading ignores the entries past it.
+
+        Parameters:
+            path (str): The common prefix of the journal files.
+        """
+        self.path = path
+        self.snapshot_count = 0
+        self._count = 0
+        self._committed_count = 0
+        self._string_count = 0
+        self._amounts_file = None
+        self._timestamps_file = None
+        self._ids_file = None
+        self._strings_file = None
+
+    def load(self):
+        """
+        Loads the journal and opens it for appending.
+
+        The columns are copied straight out of memory-mapped files, so no
+        entry is parsed on its own. Entries past the committed count, and
+        entries whose description did not reach the description table, are
+        left over from an interrupted write and are dropped.
+
+        Returns:
+            tuple: The amounts array, the description index array, the
+                timestamps array, the description table and the snapshot as a
+                (count, balance, spent) tuple, or None if there is no usable
+                snapshot.
+        """
+        descriptions = []
+        data = self._read(self.path + '.strings')
+        offset = 0
+        while offset + _LENGTH.size <= len(data):
+            (length,) = _LENGTH.unpack_from(data, offset)
+            end = offset + _LENGTH.size + length
+            if end > len(data):
+                break
+            descriptions.append(data[offset + _LENGTH.size:end].decode())
+            offset = end
+        amounts = self._read_column(self.path + '.amounts', 'd')
+        description_ids = self._read_column(self.path + '.descriptions', 'I')
+        count = min(len(amounts), len(description_ids))
+        data = self._read(self.path + '.committed')
+        if len(data) == _COMMITTED.size:
+            count = min(count, _COMMITTED.unpack(data)[0])
+        if count and max(description_ids[:count]) >= len(descriptions):
+            count = next(index for index in range(count) if description_ids[index] >= len(descriptions))
+        timestamps = self._read_column(self.path + '.timestamps', 'd')
+        if os.path.exists(self.path + '.timestamps'):
+            count = min(count, len(timestamps))
+        del amounts[count:]
+        del description_ids[count:]
+        del timestamps[count:]
+        stored_timestamps = len(timestamps)
+        # Journals written before timestamps existed have no timestamps file.
+        timestamps.extend(repeat(NAN, count - stored_timestamps))
+
+        snapshot = None
+        data = self._read(self.path + '.snapshot')
+        if len(data) == _SNAPSHOT.size:
+            snapshot = _SNAPSHOT.unpack(data)
+            if snapshot[0] > count:
+                snapshot = None
+
+        self._strings_file = self._open_truncated(self.path + '.strings', offset)
+        self._amounts_file = self._open_truncated(self.path + '.amounts', count * amounts.itemsize)
+        self._ids_file = self._open_truncated(self.path + '.descriptions', count * description_ids.itemsize)
+        self._timestamps_file = self._open_truncated(self.path + '.timestamps',
+                                                     stored_timestamps * timestamps.itemsize)
+        self._timestamps_file.write(timestamps[stored_timestamps:].tobytes())
+        self._string_count = len(descriptions)
+        self._count = count
+        self._committed_count = None
+        self.snapshot_count = snapshot[0] if snapshot else 0
+        return (amounts, description_ids, timestamps, descriptions, snapshot)
+
+    @staticmethod
+    def _read(path):
+        """
+        Reads a whole file through a memory map.
+
+        Parameters:
+            path (str): The path of the file.
+
+        Returns:
+            bytes: The contents of the file, or empty bytes if it does not exist.
+        """
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return b''
+        with open(path, 'rb') as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
+
+    @staticmethod
+    def _read_column(path, typecode):
+        """
+        Copies a column file into an array straight from a memory map.
+
+        Parameters:
+            path (str): The path of the column file.
+            typecode (str): The array typecode of the column.
+
+        Returns:
+            array: The whole entries of the column. A trailing partial entry
+                is ignored.
+        """
+        column = array(typecode)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return column
+        with open(path, 'rb') as stream:
+            with mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped) as view:
+                    column.frombytes(view[:len(view) - len(view) % column.itemsize])
+        return column
+
+    @staticmethod
+    def _open_truncated(path, size):
+        """
+        Opens a file for appending after cutting it to the given size.
+
+        Parameters:
+            path (str): The path of the file.
+            size (int): The size in bytes to keep.
+
+        Returns:
+            file object: The file opened in binary append mode.
+        """
+        stream = open(path, 'ab')
+        stream.truncate(size)
+        return stream
+
+    def append(self, amount, description_id, description, timestamp):
+        """
+        Appends an entry to the journal.
+
+        Writes are buffered; call flush to make them durable.
+
+        Parameters:
+            amount (float): The signed amount of the entry.
+            description_id (int): The index of the description in the table.
+            description (str): The description of the entry. It is written to
+                the table the first time its index is seen.
+            timestamp (float): The POSIX timestamp of the entry, or NaN.
+        """
+        if description_id == self._string_count:
+            encoded = description.encode()
+            self._strings_file.write(_LENGTH.pack(len(encoded)))
+            self._strings_file.write(encoded)
+            self._string_count += 1
+        self._ids_file.write(_DESCRIPTION_ID.pack(description_id))
+        self._timestamps_file.write(_AMOUNT.pack(timestamp))
+        self._amounts_file.write(_AMOUNT.pack(amount))
+        self._count += 1
+
+    def extend(self, amounts, description_ids, timestamps, new_descriptions):
+        """
+        Appends many entries to the journal with one write per file.
+
+        Parameters:
+            amounts (memoryview or array): The signed amounts as doubles.
+            description_ids (memoryview or array): The description indexes as
+                unsigned ints.
+            timestamps (memoryview or array): The timestamps as doubles.
+            new_descriptions (list): The descriptions added to the table
+                since the last write, in table order.
+        """
+        for description in new_descriptions:
+            encoded = description.encode()
+            self._strings_file.write(_LENGTH.pack(len(encoded)))
+            self._strings_file.write(encoded)
+        self._string_count += len(new_descriptions)
+        self._ids_file.write(description_ids)
+        self._timestamps_file.write(timestamps)
+        self._amounts_file.write(amounts)
+        self._count += len(amounts)
+
+    def write_snapshot(self, count, balance, spent):
+        """
+        Flushes the journal and records the balance and spending after the
+        first count entries.
+
+        Parameters:
+            count (int): The number of entries the snapshot covers.
+            balance (float): The balance after those entries.
+            spent (float): The total spent after those entries.
+        """
+        self.flush()
+        temporary_path = self.path + '.snapshot.tmp'
+        with open(temporary_path, 'wb') as stream:
+            stream.write(_SNAPSHOT.pack(count, balance, spent))
+        os.replace(temporary_path, self.path + '.snapshot')
+        self.snapshot_count = count
+
+    def flush(self, sync=False):
+        """
+        Writes buffered entries to disk, description table first, then
+        records them as committed.
+
+        Parameters:
+            sync (bool, optional): If True, also waits until the operating
+                system has stored the files on the device with os.fsync, so
+                the entries survive a power loss. Defaults to False.
+        """
+        for stream in (self._strings_file, self._ids_file, self._timestamps_file, self._amounts_file):
+            stream.flush()
+            if sync:
+                os.fsync(stream.fileno())
+        if self._count != self._committed_count:
+            temporary_path = self.path + '.committed.tmp'
+            with open(temporary_path, 'wb') as stream:
+                stream.write(_COMMITTED.pack(self._count))
+                if sync:
+                    stream.flush()
+                    os.fsync(stream.fileno())
+            os.replace(temporary_path, self.path + '.committed')
+            self._committed_count = self._count
+
+    def close(self):
+        """
+        Flushes and closes the journal files.
+        """
+        self.flush()
+        self._strings_file.close()
+        self._ids_file.close()
+        self._timestamps_file.close()
+        self._amounts_file.close()
+
+
+def _to_timestamp(value):
+    """
+    Converts a point in time into a POSIX timestamp.
+
+    Parameters:
+        value (datetime, date, int, float or None): The point in time. A date
+            means midnight local time at the start of that day.
+
+    Returns:
+        float: The POSIX timestamp, or NaN if value is None.
+    """
+    if value is None:
+        return NAN
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day).timestamp()
+    return float(value)
+
+def _to_bound(value):
+    """
+    Converts an optional query bound into a POSIX timestamp.
+
+    Parameters:
+        value (datetime, date, int, float or None): The bound.
+
+    Returns:
+        float or None: The POSIX timestamp, or None if there is no bound.
+    """
+    return None if value is None else _to_timestamp(value)
+
+
 class Category:
+    _lock = None
     
-    def __init__(self, name):
+    def __init__(self, name, journal=None, snapshot_every=10000):
         """
         Initializes a new Category object.
 
         Parameters:
             name (str): The name of the Category as a string.
+            journal (str, optional): The path prefix of a Journal that every
+                entry is appended to. If the journal already exists, the
+                category is restored from it. Defaults to None (in memory only).
+            snapshot_every (int, optional): The number of entries after which
+                a new snapshot of the balance is written to the journal.
+                Defaults to 10000.
         """
-        self.ledger = []
+        self.ledger = Ledger()
         self.name = name
+        self._balance = 0
+        self._spent = 0
+        self._journal = None
+        self._index = None
+        self.snapshot_every = snapshot_every
+        if journal is not None:
+            self._journal = Journal(journal)
+            self._restore(*self._journal.load())
+
+    def _restore(self, amounts, description_ids, timestamps, descriptions, snapshot):
+        """
+        Restores the ledger and the running totals from loaded journal columns.
+
+        With a snapshot only the entries written after it are added up, so
+        restoring does not walk the whole history.
+
+        Parameters:
+            amounts (array): The amounts column.
+            description_ids (array): The description index column.
+            timestamps (array): The timestamps column.
+            descriptions (list): The description table.
+            snapshot (tuple or None): The (count, balance, spent) snapshot.
+        """
+        self.ledger = Ledger.from_columns(amounts, description_ids, descriptions, timestamps)
+        start = 0
+        if snapshot is not None:
+            start, self._balance, self._spent = snapshot
+        for amount in self.ledger.amounts()[start:]:
+            self._balance += amount
+            if amount < 0:
+                self._spent -= amount
+
+    def snapshot(self):
+        """
+        Writes a snapshot of the balance and spending to the journal.
+
+        Does nothing if the category has no journal.
+        """
+        if self._journal is not None:
+            self._journal.write_snapshot(len(self.ledger), self._balance, self._spent)
+
+    def flush(self, sync=False):
+        """
+        Writes buffered journal entries to disk, if there is a journal.
+
+        Parameters:
+            sync (bool, optional): If True, waits until the entries are stored
+                on the device. See Journal.flush. Defaults to False.
+        """
+        if self._journal is not None:
+            self._journal.flush(sync)
+
+    def close(self):
+        """
+        Writes a final snapshot and closes the journal, if there is one.
+        """
+        if self._journal is not None:
+            self.snapshot()
+            self._journal.close()
+            self._journal = None
     
-    def deposit(self, amount, description = ''):
+    def deposit(self, amount, description = '', timestamp=None):
         """
         Adds a deposit to the ledger.
 
@@ -18,10 +780,13 @@ class Category:
             amount (int): The amount to add as an integer.
             description (str, optional): A description of the deposit as a string.
                 Defaults to an empty string.
+            timestamp (datetime, date, int or float, optional): When the
+                deposit happened, as a datetime or a POSIX timestamp.
+                Defaults to None (no timestamp).
         """
-        self.ledger.append({'amount': amount, 'description': description})
+        self._append(amount, description, timestamp)
 
-    def withdraw(self, amount, description = ''):
+    def withdraw(self, amount, description = '', timestamp=None):
         """
         Withdraws a given amount from the budget category when the budget has enough funds.
 
@@ -29,28 +794,299 @@ class Category:
             amount (int): The amount to withdraw as an integer.
             description (str, optional): A description of the withdrawal as a string.
                 Defaults to an empty string.
+            timestamp (datetime, date, int or float, optional): When the
+                withdrawal happened. Defaults to None (no timestamp).
 
         Returns:
             bool: A boolean indicating whether the withdrawal was successful.
         """
         if self.check_funds(amount):
-            self.ledger.append({'amount': -amount, 'description': description})
+            self._append(-amount, description, timestamp)
             return True
         return False
 
-    def get_balance(self):
+    def _append(self, amount, description, timestamp=None):
+        """
+        Appends an entry to the ledger and updates the running balance.
+
+        Every change to the ledger goes through this method, so the running
+        balance always matches the sum of the ledger amounts and every entry
+        reaches the query index and the journal, if there are any.
+
+        Parameters:
+            amount (int or float): The signed amount of the entry.
+            description (str): The description of the entry.
+            timestamp (datetime, date, int or float, optional): When the
+                entry happened. Defaults to None (no timestamp).
+        """
+        timestamp = _to_timestamp(timestamp)
+        description_id = self.ledger.append(amount, description, timestamp)
+        self._balance += amount
+        if amount < 0:
+            self._spent -= amount
+        if self._index is not None:
+            self._index.add(amount, description, timestamp)
+        if self._journal is not None:
+            self._journal.append(amount, description_id, description, timestamp)
+            if len(self.ledger) - self._journal.snapshot_count >= self.snapshot_every:
+                self.snapshot()
+
+    def _extend(self, amounts, descriptions, timestamps=None):
+        """
+        Appends many entries to the ledger and updates the running totals.
+
+        This is the bulk counterpart of _append: the ledger and the journal
+        receive all the entries in one operation each.
+
+        Parameters:
+            amounts (array): The signed amounts of the entries as doubles.
+            descriptions (list): The descriptions of the entries.
+            timestamps (iterable, optional): When each entry happened.
+                Defaults to no timestamps.
+
+        Raises:
+            ValueError: If there is not one description and one timestamp
+                per amount.
+        """
+        if timestamps is None:
+            timestamps = array('d', repeat(NAN, len(amounts)))
+        else:
+            timestamps = array('d', map(_to_timestamp, timestamps))
+        if len(amounts) != len(descriptions) or len(amounts) != len(timestamps):
+            raise ValueError('There must be one description and one timestamp per amount')
+        start = len(self.ledger)
+        new_descriptions = self.ledger.extend(amounts, descriptions, timestamps)
+        balance = self._balance
+        spent = self._spent
+        for amount in amounts:
+            balance += amount
+            if amount < 0:
+                spent -= amount
+        self._balance = balance
+        self._spent = spent
+        if self._index is not None:
+            for amount, description, timestamp in zip(amounts, descriptions, timestamps):
+                self._index.add(amount, description, timestamp)
+        if self._journal is not None:
+            self._journal.extend(self.ledger.amounts()[start:], self.ledger.description_ids()[start:],
+                                 self.ledger.timestamps()[start:], new_descriptions)
+            if len(self.ledger) - self._journal.snapshot_count >= self.snapshot_every:
+                self.snapshot()
+
+    def deposit_many(self, amounts, descriptions=None, timestamps=None):
+        """
+        Adds many deposits to the ledger in one operation.
+
+        Parameters:
+            amounts (iterable): The amounts to add, for example a list or an array.
+            descriptions (iterable, optional): One description per amount.
+                Defaults to empty descriptions.
+            timestamps (iterable, optional): When each deposit happened.
+                Defaults to no timestamps.
+
+        Raises:
+            ValueError: If there is not one description and one timestamp
+                per amount.
+        """
+        amounts = array('d', amounts)
+        if descriptions is None:
+            descriptions = repeat('', len(amounts))
+        self._extend(amounts, list(descriptions), timestamps)
+
+    def withdraw_many(self, amounts, descriptions=None, timestamps=None):
+        """
+        Withdraws many amounts in one pass, skipping the ones without enough funds.
+
+        Every amount is checked against the balance left after the withdrawals
+        accepted before it, exactly as calling withdraw once per amount would.
+
+        Parameters:
+            amounts (iterable): The amounts to withdraw, for example a list or an array.
+            descriptions (iterable, optional): One description per amount.
+                Defaults to empty descriptions.
+            timestamps (iterable, optional): When each withdrawal happened.
+                Defaults to no timestamps.
+
+        Returns:
+            list: The positions of the amounts that were rejected.
+
+        Raises:
+            ValueError: If there is not one description and one timestamp
+                per amount.
+        """
+        amounts = list(amounts)
+        descriptions = [''] * len(amounts) if descriptions is None else list(descriptions)
+        timestamps = [None] * len(amounts) if timestamps is None else list(timestamps)
+        if len(amounts) != len(descriptions) or len(amounts) != len(timestamps):
+            raise ValueError('There must be one description and one timestamp per amount')
+        balance = self._balance
+        accepted_amounts = array('d')
+        accepted_descriptions = []
+        accepted_timestamps = []
+        rejected = []
+        for position, (amount, description, timestamp) in enumerate(zip(amounts, descriptions, timestamps)):
+            if amount > balance:
+                rejected.append(position)
+            else:
+                balance -= amount
+                accepted_amounts.append(-amount)
+                accepted_descriptions.append(description)
+                accepted_timestamps.append(timestamp)
+        self._extend(accepted_amounts, accepted_descriptions, accepted_timestamps)
+        return rejected
+
+    def transfer_many(self, amounts, budgets, timestamps=None):
+        """
+        Transfers many amounts to other budget categories in one pass.
+
+        Funds are checked the same way as in withdraw_many. Each category
+        receives all its deposits in one operation. A transfer to this same
+        category is credited back to the running balance right away, so it
+        does not make later transfers fail.
+
+        Parameters:
+            amounts (iterable): The amounts to transfer.
+            budgets (iterable): The budget category to transfer each amount to.
+            timestamps (iterable, optional): When each transfer happened.
+                Defaults to no timestamps.
+
+        Returns:
+            list: The positions of the transfers that were rejected.
+
+        Raises:
+            ValueError: If there is not one budget and one timestamp per amount.
+        """
+        amounts = list(amounts)
+        budgets = list(budgets)
+        timestamps = [None] * len(amounts) if timestamps is None else list(timestamps)
+        if len(amounts) != len(budgets) or len(amounts) != len(timestamps):
+            raise ValueError('There must be one budget and one timestamp per amount')
+        balance = self._balance
+        withdrawals = array('d')
+        withdrawal_descriptions = []
+        withdrawal_timestamps = []
+        deposits = {}
+        rejected = []
+        for position, (amount, budget, timestamp) in enumerate(zip(amounts, budgets, timestamps)):
+            if amount > balance:
+                rejected.append(position)
+                continue
+            balance -= amount
+            withdrawals.append(-amount)
+            withdrawal_descriptions.append(f'Transfer to {budget.name}')
+            withdrawal_timestamps.append(timestamp)
+            if budget is self:
+                balance += amount
+            budget_amounts, budget_timestamps = deposits.setdefault(budget, (array('d'), []))
+            budget_amounts.append(amount)
+            budget_timestamps.append(timestamp)
+        self._extend(withdrawals, withdrawal_descriptions, withdrawal_timestamps)
+        description = f'Transfer from {self.name}'
+        for budget, (budget_amounts, budget_timestamps) in deposits.items():
+            budget._extend(budget_amounts, [description] * len(budget_amounts), budget_timestamps)
+        return rejected
+
+    @property
+    def total_spent(self):
+        """
+        float: The total amount withdrawn or transferred out of the category,
+            kept up to date on every entry.
+        """
+        return self._spent
+
+    def _get_index(self):
+        """
+        Returns the query index, building it from the ledger on first use.
+
+        Once built, the index is kept up to date by every new entry.
+
+        Returns:
+            LedgerIndex: The index of the ledger.
+        """
+        if self._index is None:
+            index = LedgerIndex()
+            for (amount, description), timestamp in zip(self.ledger.iter_entries(), self.ledger.timestamps()):
+                index.add(amount, description, timestamp)
+            self._index = index
+        return self._index
+
+    def get_total(self, start=None, end=None, description=None, prefix=None):
+        """
+        Returns the sum of the ledger amounts selected by time and description.
+
+        Queries run on an index of the ledger (built on first use), so they
+        take logarithmic time in the number of entries.
+
+        Parameters:
+            start (datetime, date, int or float, optional): The first moment
+                included. When start or end is given, entries without a
+                timestamp are left out.
+            end (datetime, date, int or float, optional): The first moment
+                excluded.
+            description (str, optional): Only count entries with exactly this
+                description.
+            prefix (str, optional): Only count entries whose description
+                starts with this prefix.
+
+        Returns:
+            float: The sum of the selected amounts.
+        """
+        return self._query(start, end, description, prefix)[0]
+
+    def get_spent(self, start=None, end=None, description=None, prefix=None):
+        """
+        Returns how much was withdrawn or transferred out, selected by time
+        and description.
+
+        Takes the same arguments as get_total.
+
+        Returns:
+            float: The total spent in the selected entries, as a positive number.
         """
-        Calculates and returns the current balance of the budget category.
+        return self._query(start, end, description, prefix)[1]
+
+    def _query(self, start, end, description, prefix):
+        """
+        Runs a sum query for get_total and get_spent.
+
+        Returns:
+            tuple: The sum of the amounts and the total spent.
+        """
+        if start is None and end is None and description is None and prefix is None:
+            return (self._balance, self._spent)
+        return self._get_index().sums(_to_bound(start), _to_bound(end), description, prefix)
+
+    def get_balance(self, verify=False):
+        """
+        Returns the current balance of the budget category.
+
+        The balance is kept up to date on every deposit, withdrawal and
+        transfer, so this is O(1).
+
+        Parameters:
+            verify (bool, optional): If True, the balance is recomputed from
+                the ledger and checked against the running balance. Defaults
+                to False.
 
         Returns:
             float: The current balance as a floating-point number.
+
+        Raises:
+            ValueError: If verify is True and the ledger does not add up to
+                the running balance, for example because entries were appended
+                to the ledger directly.
         """
-        balance = 0
-        for item in self.ledger:
-            balance += item['amount']
-        return balance
+        if verify:
+            balance = 0
+            for amount in self.ledger.amounts():
+                balance += amount
+            if balance != self._balance:
+                raise ValueError(
+                    f"Ledger of '{self.name}' adds up to {balance} but the running balance is {self._balance}"
+                )
+        return self._balance
 
-    def transfer(self, amount, budget):
+    def transfer(self, amount, budget, timestamp=None):
         """
         Transfers a given amount from the current budget category to the specified budget category
         if the current budget has enough funds.
@@ -58,13 +1094,15 @@ class Category:
         Parameters:
             amount (int): The amount to transfer as an integer.
             budget (Category): The budget category to transfer funds to.
+            timestamp (datetime, date, int or float, optional): When the
+                transfer happened. Defaults to None (no timestamp).
 
         Returns:
             bool: A boolean indicating whether the transfer was successful.
         """
         if self.check_funds(amount):
-            self.withdraw(amount, f'Transfer to {budget.name}')
-            budget.deposit(amount, f'Transfer from {self.name}')
+            self.withdraw(amount, f'Transfer to {budget.name}', timestamp)
+            budget.deposit(amount, f'Transfer from {self.name}', timestamp)
             return True
         return False
 
@@ -82,6 +1120,118 @@ class Category:
             return False
         return True
 
+    @staticmethod
+    def _format_entry(amount, description):
+        """
+        Formats one ledger entry as a 30 character line.
+
+        Parameters:
+            amount (float): The amount of the entry.
+            description (str): The description of the entry.
+
+        Returns:
+            str: The first 23 characters of the description, left-aligned,
+                followed by the amount right-aligned in 7 characters.
+        """
+        description = description[:23].ljust(23)
+        formatted_amount_str = f'{amount:.2f}'
+        if len(formatted_amount_str) > 7:
+            formatted_amount_str = formatted_amount_str[:7] 
+        formatted_amount = formatted_amount_str.rjust(7)
+        return f'{description}{formatted_amount}'
+
+    def iter_lines(self, start=0, stop=None):
+        """
+        Lazily generates the lines of the string representation.
+
+        Only the entries in the requested window are formatted, and no line
+        is kept after it has been yielded.
+
+        Parameters:
+            start (int, optional): The index of the first entry to include.
+                Defaults to 0.
+            stop (int, optional): The index after the last entry to include.
+                Defaults to the end of the ledger.
+
+        Yields:
+            str: The centered name header, one line per entry and the
+                'Total:' line, without newlines.
+        """
+        length = len(self.ledger)
+        start, stop, _ = slice(start, stop).indices(length)
+        yield f'{self.name:*^30}'
+        for amount, description in self.ledger.iter_entries(start, max(start, stop)):
+            yield self._format_entry(amount, description)
+        yield f'Total: {self.get_balance():.2f}'
+
+    def _render(self, start=0, stop=None):
+        """
+        Joins the lines of a window of the ledger into one string.
+
+        Parameters:
+            start (int, optional): The index of the first entry. Defaults to 0.
+            stop (int, optional): The index after the last entry. Defaults to
+                the end of the ledger.
+
+        Returns:
+            str: The header, the entries in the window and the 'Total:' line.
+        """
+        return '\n'.join(self.iter_lines(start, stop))
+
+    def head(self, count=10):
+        """
+        Returns the string representation limited to the first entries.
+
+        Parameters:
+            count (int, optional): The number of entries. Defaults to 10.
+
+        Returns:
+            str: The header, the first count entries and the 'Total:' line.
+        """
+        return self._render(0, count)
+
+    def tail(self, count=10):
+        """
+        Returns the string representation limited to the last entries.
+
+        Parameters:
+            count (int, optional): The number of entries. Defaults to 10.
+
+        Returns:
+            str: The header, the last count entries and the 'Total:' line.
+        """
+        return self._render(max(len(self.ledger) - count, 0))
+
+    def page(self, number, size=20):
+        """
+        Returns one page of the string representation.
+
+        Parameters:
+            number (int): The page number, starting at 0.
+            size (int, optional): The number of entries per page. Defaults to 20.
+
+        Returns:
+            str: The header, the entries of the page and the 'Total:' line.
+        """
+        return self._render(number * size, (number + 1) * size)
+
+    def write_to(self, stream, start=0, stop=None):
+        """
+        Writes the string representation straight into a file object.
+
+        Lines are formatted as they are written, so the full report is never
+        held in memory.
+
+        Parameters:
+            stream (file object): A text stream to write to.
+            start (int, optional): The index of the first entry. Defaults to 0.
+            stop (int, optional): The index after the last entry. Defaults to
+                the end of the ledger.
+        """
+        lines = self.iter_lines(start, stop)
+        stream.write(next(lines))
+        stream.writelines('\n' + line for line in lines)
+
     def __str__(self):
         """
         Returns a string representation of the budget category.
@@ -94,26 +1244,158 @@ class Category:
         Returns:
             str: A string representation of the budget category.
         """
-        output = [] 
-        output.append(f'{self.name:*^30}')
-        for item in self.ledger:
-            description = item['description']
-            description = description[:23].ljust(23)
-            amount = item['amount']
-            formatted_amount_str = f'{amount:.2f}'
-            if len(formatted_amount_str) > 7:
-                formatted_amount_str = formatted_amount_str[:7] 
-            formatted_amount = formatted_amount_str.rjust(7)
+        return self._render()
+
+
+@contextmanager
+def _locked(categories):
+    """
+    Holds the locks of several categories at once.
+
+    Locks are always taken in the order the categories were created, so two
+    threads locking the same categories can never wait on each other.
+    Categories without a lock are skipped.
+
+    Parameters:
+        categories (iterable): The categories to lock. Repeated ones are
+            locked once.
+    """
+    lockable = {id(category): category for category in categories if category._lock is not None}
+    ordered = sorted(lockable.values(), key=lambda category: category._lock_order)
+    for category in ordered:
+        category._lock.acquire()
+    try:
+        yield
+    finally:
+        for category in reversed(ordered):
+            category._lock.release()
+
+
+class ConcurrentCategory(Category):
+
+    def __init__(self, name, journal=None, snapshot_every=10000):
+        """
+        Initializes a Category that can be shared between threads.
+
+        Every instance has its own reentrant lock, held by every operation
+        that reads or changes the ledger. Transfers hold the locks of both
+        categories, always taken in creation order, so they are atomic and
+        cannot deadlock. Plain Category objects skip the locking overhead.
+
+        Parameters:
+            name (str): The name of the Category as a string.
+            journal (str, optional): The path prefix of a Journal. See Category.
+            snapshot_every (int, optional): The number of entries between
+                journal snapshots. Defaults to 10000.
+        """
+        self._lock = threading.RLock()
+        self._lock_order = next(_lock_order)
+        super().__init__(name, journal, snapshot_every)
 
-            output.append(f'{description}{formatted_amount}')
-        
-        total = self.get_balance()
-        output.append(f'Total: {total:.2f}')
+    def deposit(self, amount, description = '', timestamp=None):
+        """
+        Adds a deposit to the ledger while holding the category lock.
+        """
+        with self._lock:
+            super().deposit(amount, description, timestamp)
+
+    def withdraw(self, amount, description = '', timestamp=None):
+        """
+        Checks funds and withdraws as one atomic step.
+        """
+        with self._lock:
+            return super().withdraw(amount, description, timestamp)
+
+    def transfer(self, amount, budget, timestamp=None):
+        """
+        Transfers funds while holding the locks of both categories.
+        """
+        with _locked((self, budget)):
+            return super().transfer(amount, budget, timestamp)
+
+    def deposit_many(self, amounts, descriptions=None, timestamps=None):
+        """
+        Adds many deposits while holding the category lock.
+        """
+        amounts = array('d', amounts)
+        with self._lock:
+            super().deposit_many(amounts, descriptions, timestamps)
+
+    def withdraw_many(self, amounts, descriptions=None, timestamps=None):
+        """
+        Withdraws many amounts while holding the category lock.
+        """
+        with self._lock:
+            return super().withdraw_many(amounts, descriptions, timestamps)
+
+    def transfer_many(self, amounts, budgets, timestamps=None):
+        """
+        Transfers many amounts while holding the locks of every category involved.
+        """
+        amounts = list(amounts)
+        budgets = list(budgets)
+        with _locked([self] + budgets):
+            return super().transfer_many(amounts, budgets, timestamps)
+
+    def _extend(self, amounts, descriptions, timestamps=None):
+        """
+        Appends many entries while holding the category lock, so that a plain
+        Category can transfer_many into a shared one.
+        """
+        with self._lock:
+            super()._extend(amounts, descriptions, timestamps)
+
+    def _query(self, start, end, description, prefix):
+        """
+        Runs a sum query while holding the category lock.
+        """
+        with self._lock:
+            return super()._query(start, end, description, prefix)
+
+    def get_balance(self, verify=False):
+        """
+        Returns the current balance, verifying it while holding the category lock.
+        """
+        with self._lock:
+            return super().get_balance(verify)
 
-        return '\n'.join(output)
+    def snapshot(self):
+        """
+        Writes a journal snapshot while holding the category lock.
+        """
+        with self._lock:
+            super().snapshot()
 
+    def flush(self, sync=False):
+        """
+        Flushes the journal while holding the category lock.
+        """
+        with self._lock:
+            super().flush(sync)
 
-def create_spend_chart(categories):
+    def close(self):
+        """
+        Closes the journal while holding the category lock.
+        """
+        with self._lock:
+            super().close()
+
+    def _render(self, start=0, stop=None):
+        """
+        Renders a window of the ledger while holding the category lock.
+        """
+        with self._lock:
+            return super()._render(start, stop)
+
+    def write_to(self, stream, start=0, stop=None):
+        """
+        Writes a window of the ledger while holding the category lock.
+        """
+        with self._lock:
+            super().write_to(stream, start, stop)
+
+
+def create_spend_chart(categories, start=None, end=None):
     """
     Creates a bar chart representing the percentage of total spending by category.
 
@@ -127,8 +1409,38 @@ def create_spend_chart(categories):
 
     The returned string will be suitable for printing to the console.
 
+    Spending comes from the running total_spent of every category, so this is
+    O(number of categories), and the rendered chart is cached until the name
+    or spending of one of the categories changes.
+
     Parameters:
         categories (list): A list of Category objects.
+        start (datetime, date, int or float, optional): Only count spending
+            from this moment on. Entries without a timestamp are left out
+            when start or end is given.
+        end (datetime, date, int or float, optional): Only count spending
+            before this moment.
+
+    Returns:
+        str: A string containing the bar chart.
+    """
+    if start is None and end is None:
+        spending = tuple((category.name, category.total_spent) for category in categories)
+    else:
+        spending = tuple((category.name, category.get_spent(start, end)) for category in categories)
+    return _render_spend_chart(spending)
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def _render_spend_chart(spending):
+    """
+    Renders the bar chart of create_spend_chart.
+
+    The chart only depends on the names and spending of the categories, so
+    it is memoized on them and only rendered again when one of them changes.
+
+    Parameters:
+        spending (tuple): Pairs of category name and total spent, in the
+            order the categories are shown.
 
     Returns:
         str: A string containing the bar chart.
@@ -140,16 +1452,12 @@ def create_spend_chart(categories):
     names = []
     percentage_by_category = {}
 
-    for category in categories:
-        spent_by_category[category.name] = 0
-        if len_names < len(category.name):
-            len_names = len(category.name)
-        names.append(category.name)
-        movements = category.ledger
-        for move in movements:
-            if move['amount'] < 0:
-                spent_by_category[category.name] += abs(move['amount'])
-                total_spent += abs(move['amount'])
+    for name, spent in spending:
+        spent_by_category[name] = spent
+        if len_names < len(name):
+            len_names = len(name)
+        names.append(name)
+        total_spent += spent
 
     for key, value in spent_by_category.items():
         if total_spent == 0: 
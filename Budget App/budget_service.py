@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+
+from budget_app import Category, create_spend_chart
+
+OPERATIONS = ('deposit', 'withdraw', 'transfer', 'balance', 'chart')
+
+
+class BudgetService:
+
+    def __init__(self, journal_dir=None, max_batch=1024):
+        """
+        Initializes a BudgetService.
+
+        The service answers JSON-lines requests, one JSON object per line:
+
+            {"id": 1, "op": "deposit", "category": "Food", "amount": 100, "description": "initial"}
+            {"id": 2, "op": "withdraw", "category": "Food", "amount": 10.15}
+            {"id": 3, "op": "transfer", "category": "Food", "to": "Clothing", "amount": 50}
+            {"id": 4, "op": "balance", "category": "Food"}
+            {"id": 5, "op": "chart", "categories": ["Food", "Clothing"]}
+
+        and replies with {"id": ..., "ok": true, "result": ...} or
+        {"id": ..., "ok": false, "error": "..."}. Categories are created on
+        first use. A request that was applied but whose journal could not be
+        written is still answered with "ok": true, plus "durable": false and
+        a "warning", so a client does not apply it twice by retrying.
+
+        Requests from all connections go through one queue. A single task
+        takes everything queued so far as a batch, applies it in arrival
+        order, merges runs of deposits or withdrawals on the same category
+        into one deposit_many/withdraw_many call and flushes the journals once
+        per batch.
+
+        Parameters:
+            journal_dir (str, optional): A directory where every category
+                keeps its journal. Defaults to None (in memory only).
+            max_batch (int, optional): The largest number of requests applied
+                in one batch. Defaults to 1024.
+        """
+        self.journal_dir = journal_dir
+        self.max_batch = max_batch
+        self.categories = {}
+        self._queue = None
+        self._batcher = None
+
+    def get_category(self, name):
+        """
+        Returns a category by name, creating it (and restoring its journal)
+        if it does not exist yet.
+
+        The name becomes the name of the journal files, so it may not contain
+        a path separator or '..', or be empty.
+
+        Parameters:
+            name (str): The name of the category.
+
+        Returns:
+            Category: The category.
+
+        Raises:
+            ValueError: If the name is not a valid category name.
+        """
+        category = self.categories.get(name)
+        if category is None:
+            separators = ('/', '\\', '\0', os.sep, os.altsep)
+            if (not isinstance(name, str) or not name.strip() or '..' in name
+                    or any(separator and separator in name for separator in separators)):
+                raise ValueError(f'Invalid category name {name!r}')
+            journal = None
+            if self.journal_dir is not None:
+                journal = os.path.join(self.journal_dir, name)
+            category = self.categories[name] = Category(name, journal=journal)
+        return category
+
+    async def submit(self, request):
+        """
+        Queues a request and waits for its batch to be applied.
+
+        Parameters:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The response.
+        """
+        if self._batcher is None:
+            self._start_batcher()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    def _start_batcher(self):
+        """
+        Creates the request queue and the batching task.
+        """
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._run_batches())
+
+    async def _run_batches(self):
+        """
+        Applies queued requests in batches until cancelled.
+        """
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            requests = [request for request, _ in batch]
+            try:
+                responses = self.apply_batch(requests)
+            except Exception as error:
+                responses = [{'id': request.get('id') if isinstance(request, dict) else None,
+                              'ok': False, 'error': str(error)} for request in requests]
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+
+    def apply_batch(self, requests):
+        """
+        Applies a batch of requests in order.
+
+        Errors are reported per request: a run of deposits or withdrawals that
+        fails is reported as failed as a whole. When a journal cannot be
+        flushed, the requests that touched its category have still been
+        applied, and are reported as not durable; their entries are written
+        by the next flush that succeeds.
+
+        Parameters:
+            requests (list): The decoded requests.
+
+        Returns:
+            list: One response per request, in the same order.
+        """
+        responses = [None] * len(requests)
+        touched = {}
+        position = 0
+        while position < len(requests):
+            request = requests[position]
+            operation = request.get('op') if isinstance(request, dict) else None
+            if operation in ('deposit', 'withdraw') and isinstance(request.get('category'), str):
+                end = position + 1
+                while (end < len(requests) and isinstance(requests[end], dict)
+                       and requests[end].get('op') == operation
+                       and requests[end].get('category') == request['category']):
+                    end += 1
+                try:
+                    self._apply_run(requests, position, end, responses)
+                except (TypeError, ValueError, ArithmeticError, OSError) as error:
+                    for failed in range(position, end):
+                        responses[failed] = {'id': requests[failed].get('id'), 'ok': False, 'error': str(error)}
+                else:
+                    touched.setdefault(request['category'], []).extend(range(position, end))
+                position = end
+                continue
+            try:
+                result = self._apply_one(request)
+                responses[position] = {'id': request.get('id'), 'ok': True, 'result': result}
+            except (KeyError, TypeError, ValueError, ArithmeticError, OSError) as error:
+                request_id = request.get('id') if isinstance(request, dict) else None
+                responses[position] = {'id': request_id, 'ok': False, 'error': _describe(error)}
+            else:
+                if operation == 'transfer':
+                    touched.setdefault(request['category'], []).append(position)
+                    touched.setdefault(request['to'], []).append(position)
+            position += 1
+        for name, positions in touched.items():
+            try:
+                self.categories[name].flush()
+            except OSError as error:
+                for applied in positions:
+                    response = responses[applied]
+                    if response['ok']:
+                        response['durable'] = False
+                        response['warning'] = f'Applied, but the journal of {name!r} could not be written: {error}'
+        return responses
+
+    def _apply_run(self, requests, start, end, responses):
+        """
+        Applies consecutive deposits or withdrawals on one category in one call.
+
+        Parameters:
+            requests (list): The decoded requests.
+            start (int): The position of the first request of the run.
+            end (int): The position after the last request of the run.
+            responses (list): The responses, filled in for the run.
+        """
+        amounts = []
+        descriptions = []
+        positions = []
+        for position in range(start, end):
+            request = requests[position]
+            description = request.get('description', '')
+            try:
+                amount = _check_amount(request.get('amount'))
+                if not isinstance(description, str):
+                    raise ValueError("'description' must be a string")
+            except ValueError as error:
+                responses[position] = {'id': request.get('id'), 'ok': False, 'error': str(error)}
+                continue
+            amounts.append(amount)
+            descriptions.append(description)
+            positions.append(position)
+        category = self.get_category(requests[start]['category'])
+        if requests[start]['op'] == 'deposit':
+            category.deposit_many(amounts, descriptions)
+            rejected = set()
+        else:
+            rejected = set(category.withdraw_many(amounts, descriptions))
+        for index, position in enumerate(positions):
+            responses[position] = {'id': requests[position].get('id'), 'ok': True, 'result': index not in rejected}
+
+    def _apply_one(self, request):
+        """
+        Applies a single request.
+
+        Parameters:
+            request (dict): The decoded request.
+
+        Returns:
+            bool, float or str: The result of the operation.
+
+        Raises:
+            ValueError: If the operation is unknown.
+            KeyError: If a required field is missing.
+        """
+        if not isinstance(request, dict):
+            raise ValueError('Request must be a JSON object')
+        operation = request.get('op')
+        if operation == 'transfer':
+            amount = _check_amount(request['amount'])
+            return self.get_category(request['category']).transfer(amount, self.get_category(request['to']))
+        if operation == 'balance':
+            return self.get_category(request['category']).get_balance()
+        if operation == 'chart':
+            names = request['categories']
+            if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                raise ValueError("'categories' must be a list of category names")
+            return create_spend_chart([self.get_category(name) for name in names])
+        if operation in ('deposit', 'withdraw'):
+            raise ValueError("'category' must be a string")
+        raise ValueError(f"Unknown operation {operation!r}, expected one of {', '.join(OPERATIONS)}")
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves the requests of one connection, one line at a time.
+
+        Parameters:
+            reader (asyncio.StreamReader): The connection reader.
+            writer (asyncio.StreamWriter): The connection writer.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {'id': None, 'ok': False, 'error': f'Invalid JSON: {error}'}
+                else:
+                    response = await self.submit(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_tcp(self, host='127.0.0.1', port=8765):
+        """
+        Starts listening on a TCP port.
+
+        Parameters:
+            host (str, optional): The address to bind. Defaults to localhost.
+            port (int, optional): The port to bind. Use 0 for any free port.
+                Defaults to 8765.
+
+        Returns:
+            asyncio.Server: The running server.
+        """
+        return await asyncio.start_server(self.handle_client, host, port)
+
+    async def start_unix(self, path):
+        """
+        Starts listening on a Unix socket.
+
+        Parameters:
+            path (str): The path of the socket.
+
+        Returns:
+            asyncio.Server: The running server.
+        """
+        return await asyncio.start_unix_server(self.handle_client, path)
+
+    async def close(self):
+        """
+        Stops the batching task and closes the journals of every category.
+        """
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        for category in self.categories.values():
+            category.close()
+
+
+def _describe(error):
+    """
+    Turns an exception raised by a request into an error message.
+
+    Parameters:
+        error (Exception): The exception.
+
+    Returns:
+        str: The error message.
+    """
+    if isinstance(error, KeyError):
+        return f'Missing field {error.args[0]!r}'
+    return str(error)
+
+
+def _check_amount(amount):
+    """
+    Checks the amount of a deposit, withdrawal or transfer.
+
+    Parameters:
+        amount (int or float): The amount of the request.
+
+    Returns:
+        float: The amount.
+
+    Raises:
+        ValueError: If the amount is not a finite number greater than 0.
+    """
+    message = "'amount' must be a finite number greater than 0"
+    if not isinstance(amount, (int, float)) or isinstance(amount, bool):
+        raise ValueError(message)
+    try:
+        amount = float(amount)
+    except OverflowError:
+        raise ValueError(message) from None
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError(message)
+    return amount
+
+
+async def serve(service, host='127.0.0.1', port=8765, unix_path=None):
+    """
+    Runs a BudgetService until cancelled.
+
+    Parameters:
+        service (BudgetService): The service to run.
+        host (str, optional): The TCP address to bind. Defaults to localhost.
+        port (int, optional): The TCP port to bind. Defaults to 8765.
+        unix_path (str, optional): A Unix socket path to listen on instead of TCP.
+    """
+    if unix_path is not None:
+        server = await service.start_unix(unix_path)
+    else:
+        server = await service.start_tcp(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local JSON-lines budget service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--journal-dir', help='keep category journals in this directory')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(BudgetService(args.journal_dir), args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,262 @@
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from polygon_area_calculator import (PlacedRectangle, Rectangle, RectangleArray, SpatialIndex, Square,
+                                     get_amounts_inside)
+
+
+class DictRectangle:
+    """
+    Rectangle with a __dict__ that recomputes its metrics on every call, like
+    the original implementation. Only used as a baseline.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def get_area(self):
+        return (self.width * self.height)
+
+    def get_perimeter(self):
+        return (2 * self.width + 2 * self.height)
+
+    def get_diagonal(self):
+        return ((self.width ** 2 + self.height ** 2) ** .5)
+
+    def get_picture(self):
+        if self.height > 50 or self.width > 50:
+            return f'Too big for picture.'
+        picture = []
+        for i in range(self.height):
+            ast = "*" * self.width
+            picture.append(f'{ast}\n')
+        return ''.join(picture)
+
+
+def make_shapes(num_shapes, seed=0):
+    """
+    Generates random rectangles and squares.
+
+    Parameters:
+        num_shapes (int): The number of shapes to generate.
+        seed (int, optional): The seed for the random generator. Defaults to 0.
+
+    Returns:
+        list: Rectangle and Square objects, about one in four a square.
+    """
+    rng = random.Random(seed)
+    shapes = []
+    for _ in range(num_shapes):
+        if rng.random() < 0.25:
+            shapes.append(Square(rng.randint(1, 100)))
+        else:
+            shapes.append(Rectangle(rng.randint(1, 100), rng.randint(1, 100)))
+    return shapes
+
+def timed(function, *args):
+    """
+    Runs a function once and measures how long it takes.
+
+    Parameters:
+        function (callable): The function to run.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        tuple: The result of the function and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return (result, time.perf_counter() - start)
+
+def benchmark_array(num_shapes):
+    """
+    Compares RectangleArray metrics against calling the Rectangle methods in a loop.
+
+    get_amount_inside is only checked on the first shapes, since both sides
+    count the packing one pair at a time.
+
+    Parameters:
+        num_shapes (int): The number of shapes.
+    """
+    shapes = make_shapes(num_shapes)
+    parts = make_shapes(num_shapes, seed=1)
+
+    def loop():
+        return ([shape.get_area() for shape in shapes],
+                [shape.get_perimeter() for shape in shapes],
+                [shape.get_diagonal() for shape in shapes])
+
+    def vectorized(array):
+        return (array.get_area(), array.get_perimeter(), array.get_diagonal())
+
+    expected, loop_time = timed(loop)
+    array, convert_time = timed(RectangleArray.from_rectangles, shapes)
+    result, array_time = timed(vectorized, array)
+    area, perimeter, diagonal = result
+    assert area.tolist() == expected[0] and perimeter.tolist() == expected[1]
+    assert np.allclose(diagonal, expected[2], rtol=1e-15, atol=0)
+    sample = min(num_shapes, 1000)
+    amount = RectangleArray.from_rectangles(shapes[:sample]).get_amount_inside(
+        RectangleArray.from_rectangles(parts[:sample]))
+    assert amount.tolist() == [shape.get_amount_inside(part) for shape, part in zip(shapes[:sample], parts[:sample])]
+    print(f'RectangleArray  shapes={num_shapes:>9}  loop={loop_time:.3f}s  array={array_time:.4f}s  '
+          f'speedup={loop_time / array_time:.0f}x  conversion={convert_time:.3f}s')
+
+def benchmark_slots(num_shapes, queries=10):
+    """
+    Compares the memory and repeated metric queries of Rectangle against a
+    Rectangle with a __dict__ and no cache.
+
+    Parameters:
+        num_shapes (int): The number of shapes.
+        queries (int, optional): How many times every metric is asked for.
+            Defaults to 10.
+    """
+    sides = [(shape.width, shape.height) for shape in make_shapes(num_shapes)]
+    results = {}
+    for shape_class in (DictRectangle, Rectangle):
+        tracemalloc.start()
+        shapes = [shape_class(width, height) for width, height in sides]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        def query():
+            for _ in range(queries):
+                for shape in shapes:
+                    shape.get_area()
+                    shape.get_perimeter()
+                    shape.get_diagonal()
+
+        _, elapsed = timed(query)
+        results[shape_class.__name__] = (size / num_shapes, elapsed)
+    (dict_size, dict_time), (slots_size, slots_time) = results['DictRectangle'], results['Rectangle']
+    print(f'Rectangle  shapes={num_shapes:>9}  dict={dict_size:.0f}B/shape {dict_time:.3f}s  '
+          f'slots={slots_size:.0f}B/shape {slots_time:.3f}s  ({queries} queries per metric)')
+
+def benchmark_picture(num_pictures, large_side=5000):
+    """
+    Compares get_picture against the row-by-row baseline on repeated sizes,
+    and write_picture against writing one row at a time for a large picture.
+
+    Parameters:
+        num_pictures (int): The number of pictures to render.
+        large_side (int, optional): The side of the large picture written to
+            a file. Defaults to 5000.
+    """
+    sides = [(shape.width % 51, shape.height % 51) for shape in make_shapes(num_pictures)]
+    baseline = [DictRectangle(width, height) for width, height in sides]
+    shapes = [Rectangle(width, height) for width, height in sides]
+    expected, baseline_time = timed(lambda: [shape.get_picture() for shape in baseline])
+    result, cached_time = timed(lambda: [shape.get_picture() for shape in shapes])
+    assert result == expected
+    print(f'get_picture  pictures={num_pictures:>9}  rows={baseline_time:.3f}s  cached={cached_time:.3f}s')
+
+    large = Rectangle(large_side, large_side)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'picture.txt')
+
+        def write_rows():
+            with open(path, 'w') as stream:
+                for _ in range(large.height):
+                    stream.write('*' * large.width + '\n')
+
+        def write_blocks():
+            with open(path, 'w') as stream:
+                large.write_picture(stream)
+
+        _, rows_time = timed(write_rows)
+        _, blocks_time = timed(write_blocks)
+        assert os.path.getsize(path) == (large_side + 1) * large_side
+    small = io.StringIO()
+    Rectangle(7, 3).write_picture(small)
+    assert small.getvalue() == Rectangle(7, 3).get_picture()
+    print(f'write_picture  side={large_side}  rows={rows_time:.3f}s  blocks={blocks_time:.3f}s')
+
+def benchmark_packing(num_pairs, num_parts=20):
+    """
+    Measures get_amounts_inside on random containers with a few part sizes,
+    first with an empty table and then answered from it, and reports how
+    often dividing the areas overcounts and how often the two-grid fallback
+    is used.
+
+    Parameters:
+        num_pairs (int): The number of container and part pairs.
+        num_parts (int, optional): The number of distinct part sizes.
+            Defaults to 20.
+    """
+    rng = random.Random(2)
+    part_sizes = [(rng.randint(2, 40), rng.randint(2, 40)) for _ in range(num_parts)]
+    containers = [Rectangle(rng.randint(10, 300), rng.randint(10, 300)) for _ in range(num_pairs)]
+    parts = [Rectangle(*rng.choice(part_sizes)) for _ in range(num_pairs)]
+    amounts, cold_time = timed(get_amounts_inside, containers, parts)
+    again, warm_time = timed(get_amounts_inside, containers, parts)
+    assert again == amounts
+    by_area = [container.get_area() // part.get_area() for container, part in zip(containers, parts)]
+    overcounted = sum(area_amount > amount for area_amount, amount in zip(by_area, amounts))
+    blocks = sum(container.get_packing_method(part) == 'blocks' for container, part in zip(containers, parts))
+    print(f'get_amounts_inside  pairs={num_pairs:>9}  parts={num_parts}  cold={cold_time:.3f}s  '
+          f'warm={warm_time:.3f}s  area rule overcounts {overcounted / num_pairs:.0%} of pairs  '
+          f'two grids for {blocks / num_pairs:.0%}')
+
+def benchmark_spatial(num_rectangles, num_queries=10_000, num_brute=100):
+    """
+    Measures SpatialIndex on random rectangles placed on a square sheet,
+    compared with scanning every rectangle for a few point queries.
+
+    Parameters:
+        num_rectangles (int): The number of rectangles.
+        num_queries (int, optional): The number of point and window queries,
+            and of deletions and insertions. Defaults to 10000.
+        num_brute (int, optional): The number of point queries answered by
+            scanning every rectangle. Defaults to 100.
+    """
+    rng = random.Random(3)
+    side = (num_rectangles ** .5) * 10
+    rectangles = [PlacedRectangle(rng.randint(1, 10), rng.randint(1, 10), rng.uniform(0, side), rng.uniform(0, side))
+                  for _ in range(num_rectangles)]
+    points = [(rng.uniform(0, side), rng.uniform(0, side)) for _ in range(num_queries)]
+
+    index, load_time = timed(SpatialIndex, rectangles)
+    found, point_time = timed(lambda: [index.query_point(x, y) for x, y in points])
+    windows, window_time = timed(lambda: [index.query_window(x, y, x + 20, y + 20) for x, y in points])
+    brute, brute_time = timed(
+        lambda: [[rectangle for rectangle in rectangles if rectangle.contains_point(x, y)]
+                 for x, y in points[:num_brute]])
+    assert all(sorted(map(id, a)) == sorted(map(id, b)) for a, b in zip(found, brute))
+    pairs, pairs_time = timed(index.overlapping_pairs)
+    moved = rng.sample(rectangles, min(num_queries, num_rectangles))
+
+    def move():
+        for rectangle in moved:
+            index.delete(rectangle)
+            rectangle.x = rng.uniform(0, side)
+            index.insert(rectangle)
+
+    _, move_time = timed(move)
+    assert len(index) == num_rectangles
+    scan_time = brute_time / num_brute * num_queries
+    print(f'SpatialIndex  rectangles={num_rectangles:>9}  load={load_time:.3f}s  '
+          f'{num_queries} points={point_time:.3f}s (scan ~{scan_time:.0f}s)  '
+          f'windows={window_time:.3f}s  overlapping pairs={len(pairs)} in {pairs_time:.3f}s  '
+          f'{len(moved)} moves={move_time:.3f}s')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        benchmark_array(size)
+    for size in sizes:
+        benchmark_slots(size)
+    benchmark_picture(max(sizes))
+    benchmark_packing(min(max(sizes), 100_000))
+    for size in sizes:
+        if size >= 100_000:
+            benchmark_spatial(size)
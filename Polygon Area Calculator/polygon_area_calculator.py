@@ -1,14 +1,375 @@
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from operator import add, itemgetter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PICTURE_CACHE_SIZE = 256
+PICTURE_BLOCK_CACHE_SIZE = 8
+PICTURE_BLOCK_SIZE = 1 << 16
+PACKING_CACHE_ENTRIES = 1 << 22
+PACKING_MAX_POINTS = 600
+SPATIAL_MAX_CELLS = 64
+
+
+@lru_cache(maxsize=PICTURE_CACHE_SIZE)
+def _render_picture(width, height):
+    """
+    Renders a picture of asterisks, keeping the most recent ones.
+
+    Parameters:
+        width (int): The number of columns.
+        height (int): The number of rows.
+
+    Returns:
+        str: The rows of asterisks, each ending with a newline.
+    """
+    return ('*' * width + '\n') * height
+
+@lru_cache(maxsize=PICTURE_BLOCK_CACHE_SIZE)
+def _picture_block(width, rows):
+    """
+    Renders a block of rows written at once by Rectangle.write_picture.
+
+    Parameters:
+        width (int): The number of columns.
+        rows (int): The number of rows.
+
+    Returns:
+        str: The rows of asterisks, each ending with a newline.
+    """
+    return ('*' * width + '\n') * rows
+
+
+def _grid_count(width, height, part_width, part_height):
+    """
+    Counts the parts that fit in a container laid out as one grid.
+
+    Parameters:
+        width (int or float): The width of the container.
+        height (int or float): The height of the container.
+        part_width (int or float): The width of the part.
+        part_height (int or float): The height of the part.
+
+    Returns:
+        int: The number of parts in the grid.
+    """
+    return int(width // part_width) * int(height // part_height)
+
+
+def _block_count(width, height, part_width, part_height):
+    """
+    Counts the parts that fit in a container split into two grids, one with
+    the parts upright and one with them rotated.
+
+    This is the fallback of _packing_count when the exact search would be too
+    large. It always describes a real layout, so it never overcounts.
+
+    Parameters:
+        width (int or float): The width of the container.
+        height (int or float): The height of the container.
+        part_width (int or float): The width of the part.
+        part_height (int or float): The height of the part.
+
+    Returns:
+        int: The number of parts that fit.
+    """
+    best = 0
+    for first, second in ((part_width, part_height), (part_height, part_width)):
+        columns = int(width // first)
+        rows = int(height // second)
+        best = max(best,
+                   columns * rows,
+                   columns * rows + _grid_count(width - columns * first, height, second, first),
+                   columns * rows + _grid_count(width, height - rows * second, second, first))
+    return best
+
+
+def _normal_points(part_width, part_height, limit):
+    """
+    Lists the lengths that can be made by putting parts side by side.
+
+    Guillotine cuts only need to be tried at these lengths, and any length
+    can be shortened to the largest of them below it without losing a part.
+
+    Parameters:
+        part_width (int or float): The width of the part.
+        part_height (int or float): The height of the part.
+        limit (int or float): The largest length.
+
+    Returns:
+        list: The sorted lengths, starting with 0, or None if there are more
+        than PACKING_MAX_POINTS of them.
+    """
+    points = set()
+    for widths in range(int(limit // part_width) + 1):
+        start = widths * part_width
+        for heights in range(int((limit - start) // part_height) + 1):
+            points.add(start + heights * part_height)
+            if len(points) > PACKING_MAX_POINTS:
+                return None
+    return sorted(points)
+
+
+class _PackingTable:
+    """
+    The best counts of one part size, shared by all its queries.
+
+    rows[i][j] is the count of a container whose sides are the normal points
+    points[i] and points[j]. Rows are filled in order, each up to the last
+    point, so every count only needs counts that are already in the table.
+    Rows and cuts are arrays of C ints, four bytes per entry.
+    """
+    __slots__ = ('part_width', 'part_height', 'points', 'limit', 'overflow', 'cuts', 'cut_entries', 'rows')
+
+    def __init__(self, part_width, part_height):
+        self.part_width = part_width
+        self.part_height = part_height
+        self.points = [0]
+        self.limit = 0
+        self.overflow = None
+        self.cuts = [array('i')]
+        self.cut_entries = 0
+        self.rows = []
+
+    def extend(self, limit):
+        """
+        Adds the normal points up to a length, extending the filled rows.
+
+        cuts[j] lists, for every cut at points[1], points[2], ... up to half of
+        points[j], the position of the longest point that fits beside it.
+
+        Parameters:
+            limit (int or float): The length.
+
+        Returns:
+            bool: False if there are more than PACKING_MAX_POINTS up to it.
+        """
+        if limit <= self.limit:
+            return True
+        if self.overflow is not None and limit >= self.overflow:
+            return False
+        points = _normal_points(self.part_width, self.part_height, limit)
+        if points is None:
+            self.overflow = limit
+            return False
+        for length in points[len(self.points):]:
+            half = bisect_right(points, length / 2)
+            self.cuts.append(array('i', [bisect_right(points, length - cut) - 1 for cut in points[1:half]]))
+            self.cut_entries += half - 1
+        self.points = points
+        self.limit = limit
+        for position in range(len(self.rows)):
+            self._fill(position)
+        return True
+
+    def size(self):
+        """
+        Returns the number of entries in the rows and cuts of the table.
+
+        Returns:
+            int: The number of entries.
+        """
+        return len(self.rows) * len(self.points) + self.cut_entries
+
+    def _fill(self, position):
+        """
+        Fills a row up to the last point, adding it if it is the next one.
+
+        The row is a list while it is filled, which is faster to read back,
+        and is stored as an array once it is full.
+
+        Parameters:
+            position (int): The position of the row.
+        """
+        part_width = self.part_width
+        part_height = self.part_height
+        part_area = part_width * part_height
+        points = self.points
+        rows = self.rows
+        cuts = self.cuts
+        if position == len(rows):
+            rows.append(array('i'))
+        row = rows[position].tolist()
+        if len(row) < position:
+            row.extend(map(itemgetter(position), rows[len(row):position]))
+        x = points[position]
+        x_short = int(x // part_width)
+        x_long = int(x // part_height)
+        across = cuts[position]
+        sides = rows[1:len(across) + 1]
+        rests = [rows[rest] for rest in across]
+        for other in range(len(row), len(points)):
+            y = points[other]
+            best = max(x_short * int(y // part_height), x_long * int(y // part_width))
+            bound = int(x * y // part_area)
+            if best < bound:
+                along = cuts[other]
+                if along:
+                    best = max(best, max(map(add, row[1:len(along) + 1], map(row.__getitem__, along))))
+                if best < bound and across:
+                    entry = itemgetter(other)
+                    best = max(best, max(map(add, map(entry, sides), map(entry, rests))))
+            row.append(best)
+        rows[position] = array('i', row)
+
+    def count(self, width, height):
+        """
+        Returns the count of a container, filling the rows it needs.
+
+        Parameters:
+            width (int or float): The shorter side of the container.
+            height (int or float): The longer side, up to the extended limit.
+
+        Returns:
+            int: The number of parts that fit.
+        """
+        points = self.points
+        position = bisect_right(points, width) - 1
+        while len(self.rows) <= position:
+            self._fill(len(self.rows))
+        return self.rows[position][bisect_right(points, height) - 1]
+
+
+_packing_tables = {}
+
+
+def _packing_table(part_width, part_height):
+    """
+    Returns the table shared by every query of a part, most recently used
+    tables last.
+
+    Parameters:
+        part_width (int or float): The shorter side of the part.
+        part_height (int or float): The longer side of the part.
+
+    Returns:
+        _PackingTable: The table of the part.
+    """
+    key = (part_width, part_height)
+    table = _packing_tables.pop(key, None)
+    if table is None:
+        table = _PackingTable(part_width, part_height)
+    _packing_tables[key] = table
+    return table
+
+
+def _trim_packing_tables():
+    """
+    Drops the least recently used tables until the tables hold at most
+    PACKING_CACHE_ENTRIES entries, always keeping the most recent one.
+    """
+    total = sum(table.size() for table in _packing_tables.values())
+    while total > PACKING_CACHE_ENTRIES and len(_packing_tables) > 1:
+        total -= _packing_tables.pop(next(iter(_packing_tables))).size()
+
+
+def _packing_count(width, height, part_width, part_height):
+    """
+    Counts how many parts fit in a container with guillotine cuts, allowing
+    the parts to be rotated.
+
+    A container either holds a grid of parts, or is cut straight across into
+    two smaller containers packed the same way. The best count of every
+    container is kept in a table shared by all the queries of the same part.
+    When the container is longer than PACKING_MAX_POINTS cut positions, the
+    two-grid layout of _block_count is counted instead, which can be lower.
+
+    Parameters:
+        width (int or float): The width of the container.
+        height (int or float): The height of the container.
+        part_width (int or float): The width of the part.
+        part_height (int or float): The height of the part.
+
+    Returns:
+        tuple: The number of parts that fit, and 'guillotine' or 'blocks' for
+        the method that counted them.
+    """
+    if part_width > part_height:
+        part_width, part_height = part_height, part_width
+    if width > height:
+        width, height = height, width
+    if width < part_width or height < part_height:
+        return 0, 'guillotine'
+    table = _packing_table(part_width, part_height)
+    if not table.extend(height):
+        return _block_count(width, height, part_width, part_height), 'blocks'
+    size = table.size()
+    count = table.count(width, height)
+    if table.size() != size:
+        _trim_packing_tables()
+    return count, 'guillotine'
+
+
+def get_amounts_inside(containers, parts):
+    """
+    Counts how many parts fit in containers, pair by pair, like
+    Rectangle.get_amount_inside.
+
+    Queries for the same part share one table of solved containers, so
+    thousands of pairs with a few distinct parts are answered mostly from
+    that table.
+
+    Parameters:
+        containers (iterable of Rectangle): The containers.
+        parts (iterable of Rectangle): The part to fit in each container.
+
+    Returns:
+        list: The number of parts that fit in every container.
+
+    Example:
+        >>> get_amounts_inside([Rectangle(2, 9), Rectangle(16, 8)], [Square(3), Square(4)])
+        [0, 8]
+    """
+    return [container.get_amount_inside(part) for container, part in zip(containers, parts)]
+
+
 class Rectangle:
+    __slots__ = ('_width', '_height', '_area', '_perimeter', '_diagonal')
+
     def __init__(self, width, height):
         """
         Initializes a Rectangle instance with width and height.
 
+        The instance has no __dict__, and the area, perimeter and diagonal
+        are computed the first time they are asked for and kept until the
+        width or height changes.
+
         Parameters:
             width (int or float): The width of the rectangle.
             height (int or float): The height of the rectangle.
         """
-        self.width = width
-        self.height = height
+        self._width = width
+        self._height = height
+        self._area = self._perimeter = self._diagonal = None
+
+    @property
+    def width(self):
+        """
+        The width of the rectangle.
+        """
+        return self._width
+
+    @width.setter
+    def width(self, width):
+        self._width = width
+        self._area = self._perimeter = self._diagonal = None
+
+    @property
+    def height(self):
+        """
+        The height of the rectangle.
+        """
+        return self._height
+
+    @height.setter
+    def height(self, height):
+        self._height = height
+        self._area = self._perimeter = self._diagonal = None
 
     def set_width(self, width):
         """
@@ -35,7 +396,10 @@ class Rectangle:
         Returns:
             int or float: The area of the rectangle.
         """
-        return (self.width * self.height)
+        area = self._area
+        if area is None:
+            area = self._area = self._width * self._height
+        return area
 
     def get_perimeter(self):
         """
@@ -44,7 +408,10 @@ class Rectangle:
         Returns:
             int or float: The perimeter of the rectangle.
         """
-        return (2 * self.width + 2 * self.height)
+        perimeter = self._perimeter
+        if perimeter is None:
+            perimeter = self._perimeter = 2 * self._width + 2 * self._height
+        return perimeter
 
     def get_diagonal(self):
         """
@@ -53,7 +420,10 @@ class Rectangle:
         Returns:
             float: The length of the diagonal of the rectangle.
         """
-        return ((self.width ** 2 + self.height ** 2) ** .5)
+        diagonal = self._diagonal
+        if diagonal is None:
+            diagonal = self._diagonal = (self._width ** 2 + self._height ** 2) ** .5
+        return diagonal
 
     def get_picture(self):
         """
@@ -69,17 +439,40 @@ class Rectangle:
         """
         if self.height > 50 or self.width > 50:
             return f'Too big for picture.'
-        picture = []
-        for i in range(self.height):
-            ast = "*" * self.width
-            picture.append(f'{ast}\n')
-        return ''.join(picture)
+        return _render_picture(self.width, self.height)
+
+    def write_picture(self, stream):
+        """
+        Writes the picture of get_picture straight into a file object, with
+        no size limit.
+
+        The rows are written in blocks of about PICTURE_BLOCK_SIZE characters,
+        and the same block is written again and again, so the full picture is
+        never held in memory.
+
+        Parameters:
+            stream (file object): A text stream to write to.
+        """
+        width = max(self.width, 0)
+        rows_per_block = max(1, PICTURE_BLOCK_SIZE // (width + 1))
+        full_blocks, rest = divmod(max(self.height, 0), rows_per_block)
+        if full_blocks:
+            block = _picture_block(width, rows_per_block)
+            for _ in range(full_blocks):
+                stream.write(block)
+        if rest:
+            stream.write(_picture_block(width, rest))
 
     def get_amount_inside(self, other):
         """
         Calculates and returns the amount of other rectangles that can fit inside
         the current rectangle.
 
+        The rectangles are laid out without overlapping, with straight cuts
+        across the current rectangle, and may be rotated, so the amount is
+        never more than what can actually be cut out. For example, a 3x3
+        square does not fit in a 2x9 rectangle even though its area is half.
+
         Parameters:
             other (Rectangle or Square): The rectangle or square to calculate the
                 amount of fitting inside the current rectangle.
@@ -88,10 +481,28 @@ class Rectangle:
             int: The amount of other rectangles that can fit inside the current
                 rectangle.
         """
-        area1 = self.get_area()
-        area2 = other.get_area()
+        if other.width <= 0 or other.height <= 0 or self.width <= 0 or self.height <= 0:
+            return self.get_area() // other.get_area()
+        return _packing_count(self.width, self.height, other.width, other.height)[0]
+
+    def get_packing_method(self, other):
+        """
+        Returns how get_amount_inside counts other rectangles inside the
+        current rectangle.
 
-        return (area1 // area2)
+        Parameters:
+            other (Rectangle or Square): The rectangle or square to fit.
+
+        Returns:
+            str: 'guillotine' if the amount is the best layout with straight
+                cuts, 'blocks' if the current rectangle has more than
+                PACKING_MAX_POINTS cut positions and the amount is the best
+                layout of two grids, which can be lower, or 'area' if a side
+                is not positive and the areas are divided.
+        """
+        if other.width <= 0 or other.height <= 0 or self.width <= 0 or self.height <= 0:
+            return 'area'
+        return _packing_count(self.width, self.height, other.width, other.height)[1]
 
     def __str__(self):
         """
@@ -106,6 +517,8 @@ class Rectangle:
         return f'Rectangle(width={self.width}, height={self.height})'
 
 class Square(Rectangle):
+    __slots__ = ()
+
     def __init__(self, side):
         """
         Initializes a Square instance with side.
@@ -161,20 +574,464 @@ class Square(Rectangle):
         return f'Square(side={self.width})'
 
 
-rect = Rectangle(10, 5)
-print(rect.get_area())
-rect.set_height(3)
-print(rect.get_perimeter())
-print(rect)
-print(rect.get_picture())
+class RectangleArray:
+    def __init__(self, widths, heights, squares=None):
+        """
+        Initializes a RectangleArray holding many rectangles as NumPy arrays.
+
+        Every metric is computed for all the rectangles at once instead of
+        one Rectangle object at a time.
+
+        Parameters:
+            widths (sequence of int or float): The widths of the rectangles.
+            heights (sequence of int or float): The heights of the rectangles.
+            squares (sequence of bool, optional): Which rectangles are
+                squares, used when converting back to objects. Defaults to
+                None (no squares).
+
+        Raises:
+            ImportError: If NumPy is not installed.
+            ValueError: If the arrays do not have the same length.
+        """
+        if np is None:
+            raise ImportError('RectangleArray requires NumPy')
+        self.widths = np.asarray(widths)
+        self.heights = np.asarray(heights)
+        if squares is None:
+            squares = np.zeros(len(self.widths), dtype=bool)
+        self.squares = np.asarray(squares, dtype=bool)
+        if not (self.widths.shape == self.heights.shape == self.squares.shape) or self.widths.ndim != 1:
+            raise ValueError('widths, heights and squares must be one-dimensional and of the same length')
+
+    @classmethod
+    def from_sides(cls, sides):
+        """
+        Creates a RectangleArray of squares.
+
+        Parameters:
+            sides (sequence of int or float): The sides of the squares.
+
+        Returns:
+            RectangleArray: The squares.
+        """
+        sides = np.asarray(sides)
+        return cls(sides, sides, np.ones(len(sides), dtype=bool))
+
+    @classmethod
+    def from_rectangles(cls, rectangles):
+        """
+        Creates a RectangleArray from Rectangle and Square objects.
+
+        Parameters:
+            rectangles (iterable of Rectangle): The rectangles.
+
+        Returns:
+            RectangleArray: The rectangles.
+        """
+        rectangles = list(rectangles)
+        return cls([rectangle.width for rectangle in rectangles],
+                   [rectangle.height for rectangle in rectangles],
+                   [isinstance(rectangle, Square) for rectangle in rectangles])
+
+    def to_rectangles(self):
+        """
+        Converts the array back to Rectangle and Square objects.
+
+        Returns:
+            list: The rectangles, as Square objects where they are squares.
+        """
+        return [Square(width) if square else Rectangle(width, height)
+                for width, height, square in zip(self.widths.tolist(), self.heights.tolist(), self.squares.tolist())]
+
+    def __len__(self):
+        return len(self.widths)
+
+    def get_area(self):
+        """
+        Calculates the areas of the rectangles.
+
+        Returns:
+            numpy.ndarray: The area of every rectangle.
+        """
+        return self.widths * self.heights
+
+    def get_perimeter(self):
+        """
+        Calculates the perimeters of the rectangles.
+
+        Returns:
+            numpy.ndarray: The perimeter of every rectangle.
+        """
+        return 2 * self.widths + 2 * self.heights
+
+    def get_diagonal(self):
+        """
+        Calculates the diagonals of the rectangles.
+
+        Returns:
+            numpy.ndarray: The diagonal of every rectangle, as floats.
+        """
+        return np.sqrt(self.widths * self.widths + self.heights * self.heights)
+
+    def get_amount_inside(self, other):
+        """
+        Calculates how many times other rectangles fit inside these ones,
+        pair by pair, with the same rule as Rectangle.get_amount_inside.
+
+        The packing is not vectorized: pairs are counted one by one through
+        the table shared by every part of the same size.
+
+        Parameters:
+            other (RectangleArray or Rectangle): The rectangles to fit, one per
+                rectangle of this array, or a single rectangle to fit in all
+                of them.
+
+        Returns:
+            numpy.ndarray: The amount for every pair.
+        """
+        if isinstance(other, RectangleArray):
+            part_widths = other.widths.tolist()
+            part_heights = other.heights.tolist()
+        else:
+            part_widths = [other.width] * len(self)
+            part_heights = [other.height] * len(self)
+        containers = [Rectangle(width, height) for width, height in zip(self.widths.tolist(), self.heights.tolist())]
+        parts = [Rectangle(width, height) for width, height in zip(part_widths, part_heights)]
+        return np.array(get_amounts_inside(containers, parts))
+
+    def __str__(self):
+        """
+        Returns a string representation of the RectangleArray instance.
+
+        Returns:
+            str: A string with the number of rectangles.
+        """
+        return f'RectangleArray(size={len(self)})'
+
+
+class PlacedRectangle(Rectangle):
+    __slots__ = ('x', 'y')
+
+    def __init__(self, width, height, x=0, y=0):
+        """
+        Initializes a PlacedRectangle instance, a rectangle with a position on a sheet.
+
+        The rectangle covers the points from (x, y) included to
+        (x + width, y + height) excluded, so rectangles that only touch do
+        not overlap.
+
+        Parameters:
+            width (int or float): The width of the rectangle.
+            height (int or float): The height of the rectangle.
+            x (int or float, optional): The left edge. Defaults to 0.
+            y (int or float, optional): The bottom edge. Defaults to 0.
+        """
+        super().__init__(width, height)
+        self.x = x
+        self.y = y
+
+    def contains_point(self, x, y):
+        """
+        Checks whether a point lies inside the rectangle.
+
+        Parameters:
+            x (int or float): The x coordinate of the point.
+            y (int or float): The y coordinate of the point.
+
+        Returns:
+            bool: True if the point is inside the rectangle.
+        """
+        return self.x <= x < self.x + self._width and self.y <= y < self.y + self._height
+
+    def overlaps(self, other):
+        """
+        Checks whether the rectangle overlaps another one.
+
+        Parameters:
+            other (PlacedRectangle): The other rectangle.
+
+        Returns:
+            bool: True if the rectangles share some area.
+        """
+        return (max(self.x, other.x) < min(self.x + self._width, other.x + other.width)
+                and max(self.y, other.y) < min(self.y + self._height, other.y + other.height))
+
+    def __str__(self):
+        """
+        Returns a string representation of the PlacedRectangle instance.
+
+        Returns:
+            str: A string with the size and position of the rectangle.
+        """
+        return f'PlacedRectangle(width={self.width}, height={self.height}, x={self.x}, y={self.y})'
+
+
+class SpatialIndex:
+    def __init__(self, rectangles=(), cell_size=None):
+        """
+        Initializes a SpatialIndex, a uniform grid of PlacedRectangle objects.
+
+        The sheet is divided into square cells, and every rectangle is listed
+        in each cell it covers, so queries only look at the rectangles of the
+        cells they touch instead of at every rectangle. A rectangle that
+        spans several cells is reported once, from the first cell that the
+        query and the rectangle share.
+
+        A rectangle that would cover more than SPATIAL_MAX_CELLS cells is kept
+        in a separate list that every query checks instead, so a cell size
+        chosen from small rectangles does not make a large one fill millions
+        of cells.
+
+        A rectangle must be deleted before it is moved or resized, and
+        inserted again afterwards.
+
+        Parameters:
+            rectangles (iterable of PlacedRectangle, optional): The rectangles
+                to load. Defaults to none.
+            cell_size (int or float, optional): The side of the cells.
+                Defaults to the mean longest side of the first rectangles
+                loaded, so it should be given when the index starts empty
+                and is filled one rectangle at a time.
+        """
+        self.cell_size = cell_size
+        self._cells = {}
+        self._ranges = {}
+        self._large = {}
+        self.bulk_load(rectangles)
+
+    def _cell_range(self, x0, y0, x1, y1):
+        """
+        Finds the cells covered by an area.
+
+        Parameters:
+            x0 (int or float): The left edge.
+            y0 (int or float): The bottom edge.
+            x1 (int or float): The right edge.
+            y1 (int or float): The top edge.
+
+        Returns:
+            tuple: The first and last cell columns and rows.
+        """
+        size = self.cell_size
+        return (int(x0 // size), int(y0 // size), int(x1 // size), int(y1 // size))
+
+    def bulk_load(self, rectangles):
+        """
+        Adds many rectangles to the index.
+
+        Parameters:
+            rectangles (iterable of PlacedRectangle): The rectangles to add.
+
+        Raises:
+            ValueError: If a rectangle is already in the index.
+        """
+        rectangles = list(rectangles)
+        if self.cell_size is None:
+            if not rectangles:
+                return
+            sides = [max(rectangle.width, rectangle.height) for rectangle in rectangles]
+            self.cell_size = sum(sides) / len(sides) or 1
+        cells = self._cells
+        ranges = self._ranges
+        for rectangle in rectangles:
+            if rectangle in ranges:
+                raise ValueError(f'{rectangle} is already in the index')
+            cell_range = self._cell_range(rectangle.x, rectangle.y,
+                                          rectangle.x + rectangle.width, rectangle.y + rectangle.height)
+            x0, y0, x1, y1 = cell_range
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > SPATIAL_MAX_CELLS:
+                ranges[rectangle] = None
+                self._large[rectangle] = None
+                continue
+            ranges[rectangle] = cell_range
+            for column in range(x0, x1 + 1):
+                for row in range(y0, y1 + 1):
+                    cell = cells.get((column, row))
+                    if cell is None:
+                        cells[(column, row)] = [rectangle]
+                    else:
+                        cell.append(rectangle)
+
+    def insert(self, rectangle):
+        """
+        Adds a rectangle to the index.
+
+        Parameters:
+            rectangle (PlacedRectangle): The rectangle to add.
+
+        Raises:
+            ValueError: If the rectangle is already in the index.
+        """
+        self.bulk_load((rectangle,))
+
+    def delete(self, rectangle):
+        """
+        Removes a rectangle from the index.
+
+        Parameters:
+            rectangle (PlacedRectangle): The rectangle to remove.
+
+        Raises:
+            KeyError: If the rectangle is not in the index.
+        """
+        cell_range = self._ranges.pop(rectangle)
+        if cell_range is None:
+            del self._large[rectangle]
+            return
+        x0, y0, x1, y1 = cell_range
+        cells = self._cells
+        for column in range(x0, x1 + 1):
+            for row in range(y0, y1 + 1):
+                cell = cells[(column, row)]
+                cell.remove(rectangle)
+                if not cell:
+                    del cells[(column, row)]
+
+    def __len__(self):
+        return len(self._ranges)
+
+    def __iter__(self):
+        return iter(self._ranges)
+
+    def __contains__(self, rectangle):
+        return rectangle in self._ranges
+
+    def query_point(self, x, y):
+        """
+        Finds the rectangles that contain a point.
+
+        Parameters:
+            x (int or float): The x coordinate of the point.
+            y (int or float): The y coordinate of the point.
+
+        Returns:
+            list: The rectangles that contain the point.
+        """
+        if self.cell_size is None:
+            return []
+        size = self.cell_size
+        cell = self._cells.get((int(x // size), int(y // size)), ())
+        found = [rectangle for rectangle in cell if rectangle.contains_point(x, y)]
+        found.extend(rectangle for rectangle in self._large if rectangle.contains_point(x, y))
+        return found
+
+    def query_window(self, x0, y0, x1, y1):
+        """
+        Finds the rectangles that overlap a window.
+
+        Parameters:
+            x0 (int or float): The left edge of the window.
+            y0 (int or float): The bottom edge of the window.
+            x1 (int or float): The right edge of the window, excluded.
+            y1 (int or float): The top edge of the window, excluded.
+
+        Returns:
+            list: The rectangles that share some area with the window.
+        """
+        if self.cell_size is None or x1 <= x0 or y1 <= y0:
+            return []
+        found = self._query_cells(x0, y0, x1, y1)
+        found.extend(rectangle for rectangle in self._large
+                     if max(rectangle.x, x0) < min(rectangle.x + rectangle.width, x1)
+                     and max(rectangle.y, y0) < min(rectangle.y + rectangle.height, y1))
+        return found
+
+    def _query_cells(self, x0, y0, x1, y1):
+        """
+        Finds the rectangles listed in the cells that overlap a window.
+
+        When the window covers more cells than there are cells in use, the
+        cells in use are scanned instead of the window.
+
+        Parameters:
+            x0 (int or float): The left edge of the window.
+            y0 (int or float): The bottom edge of the window.
+            x1 (int or float): The right edge of the window, excluded.
+            y1 (int or float): The top edge of the window, excluded.
+
+        Returns:
+            list: The rectangles of the cells that share some area with the
+            window.
+        """
+        first_column, first_row, last_column, last_row = self._cell_range(x0, y0, x1, y1)
+        cells = self._cells
+        ranges = self._ranges
+        if (last_column - first_column + 1) * (last_row - first_row + 1) > len(cells):
+            keys = [key for key in cells
+                    if first_column <= key[0] <= last_column and first_row <= key[1] <= last_row]
+        else:
+            keys = [(column, row) for column in range(first_column, last_column + 1)
+                    for row in range(first_row, last_row + 1)]
+        found = []
+        for column, row in keys:
+            for rectangle in cells.get((column, row), ()):
+                start_column, start_row = ranges[rectangle][:2]
+                if (column == max(start_column, first_column) and row == max(start_row, first_row)
+                        and max(rectangle.x, x0) < min(rectangle.x + rectangle.width, x1)
+                        and max(rectangle.y, y0) < min(rectangle.y + rectangle.height, y1)):
+                    found.append(rectangle)
+        return found
+
+    def query_overlaps(self, rectangle):
+        """
+        Finds the rectangles of the index that overlap a rectangle.
+
+        Parameters:
+            rectangle (PlacedRectangle): The rectangle, which may or may not be
+                in the index.
+
+        Returns:
+            list: The other rectangles that share some area with it.
+        """
+        return [other for other in self.query_window(rectangle.x, rectangle.y, rectangle.x + rectangle.width,
+                                                     rectangle.y + rectangle.height)
+                if other is not rectangle]
+
+    def overlapping_pairs(self):
+        """
+        Finds every pair of rectangles of the index that overlap.
+
+        Only rectangles that share a cell are compared, and every pair is
+        reported from the first cell the two rectangles share. The rectangles
+        kept out of the cells are compared with each other and looked up in
+        the cells.
+
+        Returns:
+            list: Tuples with the two rectangles of every overlapping pair.
+        """
+        ranges = self._ranges
+        large = list(self._large)
+        pairs = []
+        for i, first in enumerate(large):
+            pairs.extend((first, second) for second in large[i + 1:] if first.overlaps(second))
+            pairs.extend((first, second) for second in self._query_cells(
+                first.x, first.y, first.x + first.width, first.y + first.height))
+        for (column, row), cell in self._cells.items():
+            for i, first in enumerate(cell):
+                first_column, first_row = ranges[first][:2]
+                for second in cell[i + 1:]:
+                    second_column, second_row = ranges[second][:2]
+                    if (column == max(first_column, second_column) and row == max(first_row, second_row)
+                            and first.overlaps(second)):
+                        pairs.append((first, second))
+        return pairs
+
+
+if __name__ == '__main__':
+    rect = Rectangle(10, 5)
+    print(rect.get_area())
+    rect.set_height(3)
+    print(rect.get_perimeter())
+    print(rect)
+    print(rect.get_picture())
 
-sq = Square(9)
-print(sq.get_area())
-sq.set_side(4)
-print(sq.get_diagonal())
-print(sq)
-print(sq.get_picture())
+    sq = Square(9)
+    print(sq.get_area())
+    sq.set_side(4)
+    print(sq.get_diagonal())
+    print(sq)
+    print(sq.get_picture())
 
-rect.set_height(8)
-rect.set_width(16)
-print(rect.get_amount_inside(sq))
\ No newline at end of file
+    rect.set_height(8)
+    rect.set_width(16)
+    print(rect.get_amount_inside(sq))
@@ -1,5 +1,78 @@
 import copy
+import math
 import random
+import time
+from collections.abc import Sequence
+from functools import lru_cache
+from itertools import count
+from multiprocessing import Pool
+from statistics import NormalDist
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+VECTORIZED_CHUNK_SIZE = 1_000_000
+SEEDED_CHUNK_SIZE = 10_000
+EXACT_MAX_WORK = 10_000_000
+# NumPy's multivariate_hypergeometric only samples hats with fewer balls.
+VECTORIZED_MAX_BALLS = 10 ** 9
+
+class HatContents(Sequence):
+    """
+    Read-only view of the balls left in a Hat, as a list of colors.
+
+    The balls are not stored one by one: the view is built from the color
+    counts of the hat when it is read, and always reflects the current state
+    of the hat.
+    """
+    __slots__ = ('_hat',)
+
+    def __init__(self, hat):
+        self._hat = hat
+
+    def __len__(self):
+        return self._hat._total
+
+    def __iter__(self):
+        for color, count in zip(self._hat._colors, self._hat._counts):
+            for _ in range(count):
+                yield color
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('hat contents index out of range')
+        return self._hat._colors[self._hat._find(index)]
+
+    def __contains__(self, color):
+        return self.count(color) > 0
+
+    def count(self, color):
+        """
+        Returns the number of balls of a color left in the hat.
+
+        Parameters:
+            color (str): The ball color.
+
+        Returns:
+            int: The number of balls of that color.
+        """
+        position = self._hat._positions.get(color)
+        return 0 if position is None else self._hat._counts[position]
+
+    def __eq__(self, other):
+        if isinstance(other, (list, HatContents)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
 
 class Hat:
 
@@ -10,40 +83,129 @@ class Hat:
         Parameters:
             **kwargs: A dictionary where the keys are the ball colors and the values are the counts of each color.
 
-        The instance variable 'contents' is a list of ball colors, and 'initial_balls_dict' is a dictionary of ball colors and counts that represents the initial state of the hat.
+        The hat only stores how many balls of each color it holds, so its size does not depend on the number of balls. 'initial_balls_dict' is a dictionary of ball colors and counts that represents the initial state of the hat.
         """
-        self.contents = []
         self.initial_balls_dict = kwargs
+        self._colors = list(kwargs)
+        self._positions = {color: position for position, color in enumerate(self._colors)}
+        self._initial_counts = [max(count, 0) for count in kwargs.values()]
+        self._initial_total = sum(self._initial_counts)
+        self._counts = self._initial_counts[:]
+        self._total = self._initial_total
+
+    @property
+    def contents(self):
+        """
+        The balls left in the hat as a read-only list-like view of colors.
+        """
+        return HatContents(self)
 
-        for color, count in kwargs.items():
-            self.contents.extend([color] * count)
-    
-    def draw(self, num_balls):
+    def reset(self):
+        """
+        Puts every drawn ball back in the hat.
+        """
+        self._counts[:] = self._initial_counts
+        self._total = self._initial_total
+
+    def clone(self):
+        """
+        Returns a new hat with the initial contents of this one.
+
+        Returns:
+            Hat: The new hat.
+        """
+        hat = object.__new__(type(self))
+        hat.initial_balls_dict = self.initial_balls_dict
+        hat._colors = self._colors
+        hat._positions = self._positions
+        hat._initial_counts = self._initial_counts
+        hat._initial_total = self._initial_total
+        hat._counts = self._initial_counts[:]
+        hat._total = self._initial_total
+        return hat
+
+    def _find(self, index):
+        """
+        Finds the color of the ball at a position of the contents.
+
+        Parameters:
+            index (int): The position, between 0 and the number of balls left.
+
+        Returns:
+            int: The position of the color in the hat.
+        """
+        counts = self._counts
+        position = 0
+        while index >= counts[position]:
+            index -= counts[position]
+            position += 1
+        return position
+
+    def draw(self, num_balls, rng=random):
         """
         Draws a specified number of balls from the hat and returns them as a list.
 
         If the number of balls to draw is greater than or equal to the number of balls in the hat, the method returns all the balls in the hat and clears the hat.
 
+        Every ball is drawn in O(colors) time by picking a random position of the contents and finding its color in the counts.
+
         Parameters:
             num_balls (int): The number of balls to draw.
+            rng (random.Random, optional): The random generator to use. Defaults to the random module.
 
         Returns:
             list: A list of the drawn balls.
         """
-        if num_balls >= len(self.contents):
-            drawn_balls = self.contents[:]
-            self.contents.clear()
+        if num_balls >= self._total:
+            drawn_balls = list(self.contents)
+            self._counts[:] = [0] * len(self._counts)
+            self._total = 0
             return drawn_balls
         else:
             drawn_balls = []
             for _ in range(num_balls):
-                index = random.randrange(len(self.contents))
-                drawn_balls.append(self.contents.pop(index))
+                position = self._find(rng.randrange(self._total))
+                self._counts[position] -= 1
+                self._total -= 1
+                drawn_balls.append(self._colors[position])
             return drawn_balls
 
+    def _draw_counts(self, num_balls, rng):
+        """
+        Draws balls like draw, but returns how many were drawn of each color.
+
+        Parameters:
+            num_balls (int): The number of balls to draw.
+            rng (random.Random): The random generator to use.
+
+        Returns:
+            list: The number of balls drawn of each color, in the order of
+            the colors of the hat.
+        """
+        counts = self._counts
+        if num_balls >= self._total:
+            drawn = counts[:]
+            counts[:] = [0] * len(counts)
+            self._total = 0
+            return drawn
+        drawn = [0] * len(counts)
+        total = self._total
+        for _ in range(num_balls):
+            index = rng.randrange(total)
+            position = 0
+            while index >= counts[position]:
+                index -= counts[position]
+                position += 1
+            counts[position] -= 1
+            drawn[position] += 1
+            total -= 1
+        self._total = total
+        return drawn
 
 
-def experiment(hat, expected_balls, num_balls_drawn, num_experiments):
+
+def experiment(hat, expected_balls, num_balls_drawn, num_experiments, vectorized=False, exact=False,
+               workers=None, seed=None):
     """
     Conducts an experiment to determine the probability of drawing a specific
     configuration of balls from a hat.
@@ -60,40 +222,579 @@ def experiment(hat, expected_balls, num_balls_drawn, num_experiments):
         num_balls_drawn (int): The number of balls to draw from the hat in each
             experiment.
         num_experiments (int): The number of times the experiment is conducted.
+        vectorized (bool, optional): If True and NumPy is installed, all the
+            experiments are sampled at once with vectorized_experiment.
+            Defaults to False.
+        exact (bool, optional): If True, the probability is computed exactly
+            with exact_probability, which only falls back to running the
+            experiments when the computation would be too large. Defaults
+            to False.
+        workers (int, optional): If given, the experiments are split across
+            a pool of this many processes with seeded_experiment. Defaults
+            to None.
+        seed (int, optional): If given, the experiments run with
+            seeded_experiment, so the same seed always gives the same
+            probability. Defaults to None.
 
     Returns:
         float: The probability of drawing the expected configuration of balls
         at least once in the specified number of experiments.
     """
+    if exact:
+        return exact_probability(hat, expected_balls, num_balls_drawn, num_experiments, vectorized,
+                                 workers=workers, seed=seed)[0]
+    if workers is not None or seed is not None:
+        return seeded_experiment(hat, expected_balls, num_balls_drawn, num_experiments, seed, workers, vectorized)
+    if vectorized and np is not None:
+        return vectorized_experiment(hat, expected_balls, num_balls_drawn, num_experiments)
+
+    many_times = _count_successes(hat.initial_balls_dict, expected_balls, num_balls_drawn, num_experiments, random)
+
+    prob = many_times / num_experiments
+
+    return prob
+
+def _count_successes(initial_balls, expected_balls, num_balls_drawn, num_experiments, rng):
+    """
+    Runs experiments one by one and counts the successful ones.
+
+    Parameters:
+        initial_balls (dict): The ball colors and counts of the hat.
+        expected_balls (dict): The minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw in each experiment.
+        num_experiments (int): The number of experiments to run.
+        rng (random.Random): The random generator to draw with.
+
+    Returns:
+        int: The number of experiments that drew the expected balls.
+    """
+    hat = Hat(**initial_balls)
+    required = []
+    for color, count in expected_balls.items():
+        if color in hat._positions:
+            required.append((hat._positions[color], count))
+        elif count > 0:
+            return 0
+
     many_times = 0
 
     for _ in range(num_experiments):
-        temp_hat = Hat(**hat.initial_balls_dict)
+        hat.reset()
 
-        drawn_balls = temp_hat.draw(num_balls_drawn)
-
-        drawn_balls_counts = {}
-        for ball in drawn_balls:
-            drawn_balls_counts[ball] = drawn_balls_counts.get(ball, 0) + 1
+        drawn = hat._draw_counts(num_balls_drawn, rng)
 
         successful = True
-        for color, count in expected_balls.items():
-            if drawn_balls_counts.get(color, 0) < count:
+        for position, count in required:
+            if drawn[position] < count:
                 successful = False
                 break
 
         if successful:
             many_times += 1
 
-    prob = many_times / num_experiments
+    return many_times
 
-    return prob
+def seeded_experiment(hat, expected_balls, num_balls_drawn, num_experiments, seed=None, workers=None,
+                      vectorized=False):
+    """
+    Runs experiment reproducibly, optionally across a pool of processes.
+
+    The experiments are split into chunks of SEEDED_CHUNK_SIZE, and every
+    chunk draws from its own generator seeded with the seed and the chunk
+    number. The chunks do not depend on the number of workers, so the same
+    seed always gives the same probability, whether the chunks run in this
+    process or in a pool. The success counts of the chunks are added up at
+    the end.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        expected_balls (dict): A dictionary where keys are ball colors and
+            values are the minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw from the hat in each
+            experiment.
+        num_experiments (int): The number of times the experiment is conducted.
+        seed (int, optional): The seed of the run. Defaults to a seed taken
+            from the random module.
+        workers (int, optional): The number of processes to use. Defaults to
+            None (run in this process).
+        vectorized (bool, optional): If True and NumPy is installed, every
+            chunk is sampled with NumPy. The probability then differs from
+            the one of a non-vectorized run with the same seed. Defaults to
+            False.
+
+    Returns:
+        float: The fraction of experiments that drew at least the expected
+        number of each color.
+
+    Example:
+        >>> hat = Hat(black=6, red=4, green=3)
+        >>> a = seeded_experiment(hat, {'red': 2, 'green': 1}, 5, 100000, seed=1)
+        >>> a == seeded_experiment(hat, {'red': 2, 'green': 1}, 5, 100000, seed=1, workers=4)
+        True
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    vectorized = vectorized and np is not None
+    tasks = []
+    for chunk, start in enumerate(range(0, num_experiments, SEEDED_CHUNK_SIZE)):
+        size = min(SEEDED_CHUNK_SIZE, num_experiments - start)
+        tasks.append((hat.initial_balls_dict, expected_balls, num_balls_drawn, size, seed, chunk, vectorized))
+
+    if workers is None or workers <= 1 or len(tasks) <= 1:
+        many_times = sum(map(_run_chunk, tasks))
+    else:
+        with Pool(workers) as pool:
+            many_times = sum(pool.imap_unordered(_run_chunk, tasks))
+
+    return many_times / num_experiments
+
+def _run_chunk(task):
+    """
+    Runs one chunk of seeded_experiment.
+
+    Parameters:
+        task (tuple): The ball colors and counts of the hat, the expected
+            balls, the number of balls drawn, the number of experiments, the
+            seed, the chunk number and whether to use NumPy.
+
+    Returns:
+        int: The number of experiments that drew the expected balls.
+    """
+    initial_balls, expected_balls, num_balls_drawn, size, seed, chunk, vectorized = task
+    if vectorized:
+        # NumPy only takes non-negative seeds.
+        rng = np.random.default_rng([chunk, seed % (1 << 64)])
+        return _vectorized_count(initial_balls, expected_balls, num_balls_drawn, size, rng)
+    rng = random.Random(f'{seed}/{chunk}')
+    return _count_successes(initial_balls, expected_balls, num_balls_drawn, size, rng)
+
+def multi_experiment(hat, queries, num_balls_drawn, num_experiments, vectorized=False, seed=None):
+    """
+    Estimates the probability of several expected configurations from the same draws.
+
+    Every experiment draws once and checks the drawn color counts against
+    all the queries, so adding a query does not add any draws.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        queries (list): The expected_balls dictionaries to evaluate, as in
+            experiment.
+        num_balls_drawn (int): The number of balls to draw from the hat in each
+            experiment.
+        num_experiments (int): The number of times the experiment is conducted.
+        vectorized (bool, optional): If True and NumPy is installed, the draws
+            are sampled with NumPy like in vectorized_experiment. Defaults to
+            False.
+        seed (int, optional): The seed of the run. Defaults to None (use the
+            random module).
+
+    Returns:
+        list: The probability of every query, in the same order.
+
+    Example:
+        >>> hat = Hat(black=6, red=4, green=3)
+        >>> len(multi_experiment(hat, [{'red': 2}, {'red': 2, 'green': 1}], 5, 1000))
+        2
+    """
+    if vectorized and np is not None:
+        rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed % (1 << 64))
+        many_times = _vectorized_counts(hat.initial_balls_dict, queries, num_balls_drawn, num_experiments, rng)
+    else:
+        rng = random if seed is None else random.Random(seed)
+        many_times = _count_successes_many(hat.initial_balls_dict, queries, num_balls_drawn, num_experiments, rng)
+    return [count / num_experiments for count in many_times]
+
+def _count_successes_many(initial_balls, queries, num_balls_drawn, num_experiments, rng):
+    """
+    Runs experiments one by one and counts the successful ones for every query.
+
+    Parameters:
+        initial_balls (dict): The ball colors and counts of the hat.
+        queries (list): The expected_balls dictionaries to evaluate.
+        num_balls_drawn (int): The number of balls to draw in each experiment.
+        num_experiments (int): The number of experiments to run.
+        rng (random.Random): The random generator to draw with.
+
+    Returns:
+        list: The number of experiments that drew the expected balls of every query.
+    """
+    hat = Hat(**initial_balls)
+    many_times = [0] * len(queries)
+    checks = []
+    for number, expected_balls in enumerate(queries):
+        required = []
+        for color, count in expected_balls.items():
+            if color in hat._positions:
+                if count > 0:
+                    required.append((hat._positions[color], count))
+            elif count > 0:
+                break
+        else:
+            checks.append((number, required))
+    if not checks:
+        return many_times
+
+    for _ in range(num_experiments):
+        hat.reset()
+
+        drawn = hat._draw_counts(num_balls_drawn, rng)
+
+        for number, required in checks:
+            for position, count in required:
+                if drawn[position] < count:
+                    break
+            else:
+                many_times[number] += 1
+
+    return many_times
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """
+    Computes the Wilson score interval of a probability estimated from trials.
+
+    Parameters:
+        successes (int): The number of successful trials.
+        trials (int): The number of trials.
+        confidence (float, optional): The confidence level of the interval.
+            Defaults to 0.95.
+
+    Returns:
+        tuple: The lower and upper bounds of the interval.
+    """
+    if trials == 0:
+        return (0.0, 1.0)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    estimate = successes / trials
+    denominator = 1 + z * z / trials
+    center = (estimate + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(estimate * (1 - estimate) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(0.0, center - margin), min(1.0, center + margin))
+
+def iter_estimates(hat, expected_balls, num_balls_drawn, batch_size=SEEDED_CHUNK_SIZE, confidence=0.95,
+                   seed=None, vectorized=False):
+    """
+    Runs experiments in batches forever, yielding the running estimate after each batch.
+
+    Batches are seeded like the chunks of seeded_experiment, so with the
+    default batch size the estimate after n trials is the probability
+    seeded_experiment returns for n experiments and the same seed.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        expected_balls (dict): A dictionary where keys are ball colors and
+            values are the minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw from the hat in each
+            experiment.
+        batch_size (int, optional): The number of experiments per batch.
+            Defaults to SEEDED_CHUNK_SIZE.
+        confidence (float, optional): The confidence level of the intervals.
+            Defaults to 0.95.
+        seed (int, optional): The seed of the run. Defaults to a seed taken
+            from the random module.
+        vectorized (bool, optional): Whether batches are sampled with NumPy.
+            Defaults to False.
+
+    Yields:
+        tuple: The estimate, its Wilson interval and the number of trials so far.
+
+    Example:
+        >>> hat = Hat(black=6, red=4, green=3)
+        >>> for estimate, (low, high), trials in iter_estimates(hat, {'red': 2, 'green': 1}, 5):
+        ...     if high - low < 0.02:
+        ...         break
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    vectorized = vectorized and np is not None
+    many_times = 0
+    trials = 0
+    for chunk in count():
+        many_times += _run_chunk((hat.initial_balls_dict, expected_balls, num_balls_drawn, batch_size, seed, chunk,
+                                  vectorized))
+        trials += batch_size
+        yield (many_times / trials, wilson_interval(many_times, trials, confidence), trials)
+
+def adaptive_experiment(hat, expected_balls, num_balls_drawn, half_width=0.005, confidence=0.95, time_budget=None,
+                        max_experiments=None, batch_size=SEEDED_CHUNK_SIZE, seed=None, vectorized=False):
+    """
+    Runs experiments in batches until the probability is known precisely enough.
+
+    After every batch the Wilson interval of the estimate is updated, and
+    the run stops as soon as its half-width is at most half_width, the time
+    budget is spent or max_experiments trials have been run.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        expected_balls (dict): A dictionary where keys are ball colors and
+            values are the minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw from the hat in each
+            experiment.
+        half_width (float, optional): The target half-width of the interval.
+            Defaults to 0.005.
+        confidence (float, optional): The confidence level of the interval.
+            Defaults to 0.95.
+        time_budget (float, optional): The most seconds to run for. Defaults
+            to None (no limit).
+        max_experiments (int, optional): The most experiments to run, rounded
+            up to a whole batch. Defaults to None (no limit).
+        batch_size (int, optional): The number of experiments per batch.
+            Defaults to SEEDED_CHUNK_SIZE.
+        seed (int, optional): The seed of the run. Defaults to a seed taken
+            from the random module.
+        vectorized (bool, optional): Whether batches are sampled with NumPy.
+            Defaults to False.
+
+    Returns:
+        tuple: The estimate, its Wilson interval and the number of trials run.
+
+    Example:
+        >>> hat = Hat(black=6, red=4, green=3)
+        >>> estimate, (low, high), trials = adaptive_experiment(hat, {'red': 2, 'green': 1}, 5, half_width=0.01)
+        >>> high - low <= 0.02
+        True
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    for estimate, interval, trials in iter_estimates(hat, expected_balls, num_balls_drawn, batch_size, confidence,
+                                                     seed, vectorized):
+        if ((interval[1] - interval[0]) / 2 <= half_width
+                or (deadline is not None and time.perf_counter() >= deadline)
+                or (max_experiments is not None and trials >= max_experiments)):
+            return (estimate, interval, trials)
+
+def vectorized_experiment(hat, expected_balls, num_balls_drawn, num_experiments, rng=None):
+    """
+    Estimates the same probability as experiment with NumPy arrays.
+
+    Drawing balls one by one without replacement and counting them by color
+    is the same as sampling the color counts of each draw from a
+    multivariate hypergeometric distribution, so every experiment becomes one
+    row of color counts. Rows are sampled in chunks of VECTORIZED_CHUNK_SIZE
+    experiments and checked against the expected balls with array comparisons.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        expected_balls (dict): A dictionary where keys are ball colors and
+            values are the minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw from the hat in each
+            experiment.
+        num_experiments (int): The number of times the experiment is conducted.
+        rng (numpy.random.Generator, optional): The random generator to use.
+            Defaults to a generator seeded from the random module, so
+            random.seed makes runs reproducible.
+
+    Returns:
+        float: The fraction of experiments that drew at least the expected
+        number of each color.
+
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError('vectorized_experiment requires NumPy')
+    if rng is None:
+        rng = np.random.default_rng(random.getrandbits(64))
+    return _vectorized_count(hat.initial_balls_dict, expected_balls, num_balls_drawn, num_experiments,
+                             rng) / num_experiments
+
+def _vectorized_count(initial_balls, expected_balls, num_balls_drawn, num_experiments, rng):
+    """
+    Samples experiments with NumPy and counts the successful ones.
+
+    Hats with VECTORIZED_MAX_BALLS balls or more are drawn one experiment at
+    a time with _count_successes instead.
+
+    Parameters:
+        initial_balls (dict): The ball colors and counts of the hat.
+        expected_balls (dict): The minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw in each experiment.
+        num_experiments (int): The number of experiments to run.
+        rng (numpy.random.Generator): The random generator to use.
+
+    Returns:
+        int: The number of experiments that drew the expected balls.
+    """
+    colors = list(initial_balls)
+    counts = np.array([initial_balls[color] for color in colors], dtype=np.int64)
+    if any(count > 0 and color not in initial_balls for color, count in expected_balls.items()):
+        return 0
+    if int(counts.sum()) >= VECTORIZED_MAX_BALLS:
+        return _count_successes(initial_balls, expected_balls, num_balls_drawn, num_experiments,
+                                random.Random(int(rng.integers(1 << 63))))
+    required = np.array([expected_balls.get(color, 0) for color in colors], dtype=np.int64)
+    num_balls_drawn = min(num_balls_drawn, int(counts.sum()))
+
+    many_times = 0
+    remaining = num_experiments
+    while remaining > 0:
+        size = min(remaining, VECTORIZED_CHUNK_SIZE)
+        drawn = rng.multivariate_hypergeometric(counts, num_balls_drawn, size=size)
+        many_times += int(np.count_nonzero((drawn >= required).all(axis=1)))
+        remaining -= size
+
+    return many_times
+
+
+def _vectorized_counts(initial_balls, queries, num_balls_drawn, num_experiments, rng):
+    """
+    Samples experiments with NumPy and counts the successful ones for every query.
+
+    Like _vectorized_count, very large hats are drawn one experiment at a time.
+
+    Parameters:
+        initial_balls (dict): The ball colors and counts of the hat.
+        queries (list): The expected_balls dictionaries to evaluate.
+        num_balls_drawn (int): The number of balls to draw in each experiment.
+        num_experiments (int): The number of experiments to run.
+        rng (numpy.random.Generator): The random generator to use.
+
+    Returns:
+        list: The number of experiments that drew the expected balls of every query.
+    """
+    colors = list(initial_balls)
+    positions = {color: position for position, color in enumerate(colors)}
+    counts = np.array([initial_balls[color] for color in colors], dtype=np.int64)
+    if int(counts.sum()) >= VECTORIZED_MAX_BALLS:
+        return _count_successes_many(initial_balls, queries, num_balls_drawn, num_experiments,
+                                     random.Random(int(rng.integers(1 << 63))))
+    num_balls_drawn = min(num_balls_drawn, int(counts.sum()))
+    many_times = [0] * len(queries)
+    checks = []
+    for number, expected_balls in enumerate(queries):
+        if any(count > 0 and color not in positions for color, count in expected_balls.items()):
+            continue
+        required = [(positions[color], count) for color, count in expected_balls.items() if count > 0]
+        columns = np.array([position for position, _ in required], dtype=np.intp)
+        minimums = np.array([count for _, count in required], dtype=np.int64)
+        checks.append((number, columns, minimums))
+    if not checks:
+        return many_times
+
+    remaining = num_experiments
+    while remaining > 0:
+        size = min(remaining, VECTORIZED_CHUNK_SIZE)
+        drawn = rng.multivariate_hypergeometric(counts, num_balls_drawn, size=size)
+        for number, columns, minimums in checks:
+            many_times[number] += int(np.count_nonzero((drawn[:, columns] >= minimums).all(axis=1)))
+        remaining -= size
+
+    return many_times
+
+@lru_cache(maxsize=65536)
+def _comb(n, k):
+    """
+    Memoized binomial coefficient.
+
+    Parameters:
+        n (int): The size of the set.
+        k (int): The size of the subsets.
+
+    Returns:
+        int: The number of ways to choose k elements out of n.
+    """
+    return math.comb(n, k)
+
+def _count_successful_draws(totals, minimums, num_balls_drawn):
+    """
+    Counts the draws that contain at least a minimum number of balls of every group.
+
+    Walks the groups one at a time choosing how many balls of each one are
+    drawn, memoizing on (group, balls left to draw) and pruning branches
+    where the remaining groups cannot reach their minimums or absorb the
+    balls left.
+
+    Parameters:
+        totals (tuple): The number of balls in each group.
+        minimums (tuple): The minimum number of balls to draw from each group.
+        num_balls_drawn (int): The number of balls drawn.
+
+    Returns:
+        int: The number of successful draws.
+    """
+    suffix_total = [0] * (len(totals) + 1)
+    suffix_minimum = [0] * (len(totals) + 1)
+    for i in range(len(totals) - 1, -1, -1):
+        suffix_total[i] = suffix_total[i + 1] + totals[i]
+        suffix_minimum[i] = suffix_minimum[i + 1] + minimums[i]
+
+    @lru_cache(maxsize=None)
+    def ways(group, remaining):
+        if group == len(totals):
+            return 1 if remaining == 0 else 0
+        if remaining < suffix_minimum[group] or remaining > suffix_total[group]:
+            return 0
+        count = 0
+        low = max(minimums[group], remaining - suffix_total[group + 1])
+        for drawn in range(low, min(totals[group], remaining) + 1):
+            count += _comb(totals[group], drawn) * ways(group + 1, remaining - drawn)
+        return count
+
+    return ways(0, num_balls_drawn)
+
+def exact_probability(hat, expected_balls, num_balls_drawn, num_experiments=100_000, vectorized=False,
+                      max_work=EXACT_MAX_WORK, workers=None, seed=None):
+    """
+    Computes the probability estimated by experiment exactly.
+
+    The color counts of a draw follow a multivariate hypergeometric
+    distribution, so the probability is the number of draws that contain
+    the expected balls divided by the number of possible draws. Colors that
+    are not expected are merged into one group, and the draws are counted
+    by enumerating how many balls of each group are drawn.
+
+    When the enumeration would take more than max_work steps, the
+    probability is estimated with experiment instead.
+
+    Parameters:
+        hat (Hat): An instance of the Hat class representing the initial state
+            of the hat with balls.
+        expected_balls (dict): A dictionary where keys are ball colors and
+            values are the minimum number of each color expected to be drawn.
+        num_balls_drawn (int): The number of balls to draw from the hat.
+        num_experiments (int, optional): The number of experiments to run if
+            the exact computation is too large. Defaults to 100000.
+        vectorized (bool, optional): Whether those experiments are vectorized.
+            Defaults to False.
+        max_work (int, optional): The largest number of enumeration steps
+            allowed. Defaults to EXACT_MAX_WORK.
+        workers (int, optional): The number of processes for those
+            experiments. Defaults to None.
+        seed (int, optional): The seed for those experiments. Defaults to None.
+
+    Returns:
+        tuple: The probability as a float and the method used to get it,
+        either 'exact' or 'simulation'.
+    """
+    balls = hat.initial_balls_dict
+    total_balls = sum(balls.values())
+    required = {color: count for color, count in expected_balls.items() if count > 0}
+    if any(color not in balls for color in required):
+        return (0.0, 'exact')
+    num_balls_drawn = min(num_balls_drawn, total_balls)
+
+    totals = tuple(balls[color] for color in required)
+    minimums = tuple(required.values())
+    other_balls = total_balls - sum(totals)
+    if other_balls:
+        totals += (other_balls,)
+        minimums += (0,)
+
+    if len(totals) * (num_balls_drawn + 1) ** 2 > max_work:
+        return (experiment(hat, expected_balls, num_balls_drawn, num_experiments, vectorized,
+                           workers=workers, seed=seed), 'simulation')
 
+    successful = _count_successful_draws(totals, minimums, num_balls_drawn)
+    return (successful / _comb(total_balls, num_balls_drawn), 'exact')
 
-hat = Hat(black=6, red=4, green=3)
-probability = experiment(hat=hat,
-                  expected_balls={'red':2,'green':1},
-                  num_balls_drawn=5,
-                  num_experiments=2000)
+if __name__ == '__main__':
+    hat = Hat(black=6, red=4, green=3)
+    probability = experiment(hat=hat,
+                      expected_balls={'red':2,'green':1},
+                      num_balls_drawn=5,
+                      num_experiments=2000)
 
-print(probability)
\ No newline at end of file
+    print(probability)
\ No newline at end of file
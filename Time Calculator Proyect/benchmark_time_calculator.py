@@ -0,0 +1,96 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+from time_calculator import add_time, add_time_batch, process_file_parallel
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday', '']
+
+
+def make_rows(num_rows, seed=0):
+    """
+    Generates random shift records.
+
+    Parameters:
+        num_rows (int): The number of records to generate.
+        seed (int, optional): The seed for the random generator. Defaults to 0.
+
+    Returns:
+        tuple: Three lists with the start times, durations and days of the week.
+    """
+    rng = random.Random(seed)
+    starts = [f'{rng.randint(1, 12)}:{rng.randrange(60):02d} {rng.choice(("AM", "PM"))}'
+              for _ in range(num_rows)]
+    durations = [f'{rng.randrange(48)}:{rng.randrange(60):02d}' for _ in range(num_rows)]
+    days = [rng.choice(DAYS) for _ in range(num_rows)]
+    return (starts, durations, days)
+
+def timed(function, *args):
+    """
+    Runs a function once and measures how long it takes.
+
+    Parameters:
+        function (callable): The function to run.
+        *args: The arguments to pass to the function.
+
+    Returns:
+        tuple: The result of the function and the elapsed time in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return (result, time.perf_counter() - start)
+
+def benchmark_batch(num_rows):
+    """
+    Compares add_time_batch against calling add_time in a loop.
+
+    Parameters:
+        num_rows (int): The number of records to process.
+    """
+    starts, durations, days = make_rows(num_rows)
+    expected, scalar_time = timed(
+        lambda: [add_time(s, d, w) for s, d, w in zip(starts, durations, days)])
+    result, batch_time = timed(add_time_batch, starts, durations, days)
+    assert result == expected
+    print(f'add_time_batch  rows={num_rows:>9}  loop={scalar_time:.3f}s  '
+          f'batch={batch_time:.3f}s  speedup={scalar_time / batch_time:.1f}x')
+
+def benchmark_parallel(num_rows, max_workers=None):
+    """
+    Measures process_file_parallel on a generated file from 1 to N workers.
+
+    Parameters:
+        num_rows (int): The number of records in the generated file.
+        max_workers (int, optional): The largest number of workers to try.
+            Defaults to the number of CPUs.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    starts, durations, days = make_rows(num_rows)
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'shifts.csv')
+        with open(input_path, 'w') as stream:
+            for row in zip(starts, durations, days):
+                stream.write(','.join(row) + '\n')
+        shard_size = max(os.path.getsize(input_path) // (4 * max_workers), 1)
+        expected = None
+        base_time = None
+        for workers in range(1, max_workers + 1):
+            output_path = os.path.join(directory, f'out_{workers}.txt')
+            _, elapsed = timed(process_file_parallel, input_path, output_path, workers, shard_size)
+            with open(output_path) as stream:
+                output = stream.read()
+            if expected is None:
+                expected = output
+                base_time = elapsed
+            assert output == expected
+            print(f'process_file_parallel  rows={num_rows:>9}  workers={workers:>2}  '
+                  f'time={elapsed:.3f}s  scaling={base_time / elapsed:.2f}x')
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        benchmark_batch(size)
+    benchmark_parallel(max(sizes))
@@ -1,3 +1,28 @@
+import io
+import os
+import sys
+from collections import deque
+from multiprocessing import Pool
+from functools import lru_cache, total_ordering
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PARSE_CACHE_SIZE = 4096
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+DAY_INDEX = {name.lower(): index for index, name in enumerate(DAY_NAMES)}
+DAY_INDEX.update({index: index for index in range(7)})
+
+# 'H:MM AM/PM' for every minute of the day, indexed by minutes since midnight.
+CLOCK_STRINGS = tuple(
+    f'{(minute // 60) % 12 or 12}:{minute % 60:02d} {"PM" if minute >= 720 else "AM"}'
+    for minute in range(1440)
+)
+
+
 def check_day(day):
     """
     Returns the day of the week as a string and its corresponding index based on input.
@@ -11,20 +36,285 @@ def check_day(day):
         as an integer. For example, ('Monday', 0).
     """
 
-    if day == 'monday' or day == 0:
-        return ('Monday', 0)
-    elif day == 'tuesday' or day == 1:
-        return ('Tuesday', 1)
-    elif day == 'wednesday' or day == 2:
-        return ('Wednesday', 2)
-    elif day == 'thursday' or day == 3:
-        return ('Thursday', 3)
-    elif day == 'friday' or day == 4:
-        return ('Friday', 4)
-    elif day == 'saturday' or day == 5:
-        return ('Saturday', 5)
-    elif day == 'sunday' or day == 6:
-        return ('Sunday', 6)
+    index = DAY_INDEX.get(day)
+    if index is not None:
+        return (DAY_NAMES[index], index)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_clock(start):
+    """
+    Parses a time in the format 'HH:MM AM/PM' into minutes since midnight.
+
+    Parameters:
+        start (str): The given time as a string in the format 'HH:MM AM/PM'.
+
+    Returns:
+        int: The minutes since midnight, where '12:00 AM' is 0 and
+            '12:00 PM' is 720.
+    """
+    total_time, meridian = start.split(' ')
+    hours, minutes = total_time.split(':')
+    minutes = (int(hours) % 12) * 60 + int(minutes)
+    if meridian == 'PM':
+        minutes += 720
+    return minutes
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_duration(duration):
+    """
+    Parses a duration in the format 'HH:MM' into a number of minutes.
+
+    Parameters:
+        duration (str): The duration as a string in the format 'HH:MM'.
+
+    Returns:
+        int: The duration in minutes.
+    """
+    hours, minutes = duration.split(':')
+    return int(hours) * 60 + int(minutes)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_day(day):
+    """
+    Parses an optional day of the week into its index.
+
+    Parameters:
+        day (str): The day of the week (case-insensitive) or an empty string.
+
+    Returns:
+        int: The index of the day where Monday is 0, or -1 if no day is given.
+    """
+    if not day:
+        return -1
+    return check_day(day.lower())[1]
+
+def _format_time(minute_of_day, days, day_index):
+    """
+    Formats a time in the format returned by add_time.
+
+    Parameters:
+        minute_of_day (int): The minutes since midnight.
+        days (int): The number of days later.
+        day_index (int): The index of the day of the week, or -1 if no day
+            is included in the output.
+
+    Returns:
+        str: The time as 'HH:MM AM/PM', followed by ', day of the week' if
+            a day is given and by ' (next day)' or ' (n days later)' if days
+            is positive.
+    """
+    str_days = ''
+    if days == 1:
+        str_days = ' (next day)'
+    elif days > 1:
+        str_days = f' ({days} days later)'
+    if day_index >= 0:
+        return f'{CLOCK_STRINGS[minute_of_day]}, {DAY_NAMES[day_index]}{str_days}'
+    return f'{CLOCK_STRINGS[minute_of_day]}{str_days}'
+
+def parse_cache_info():
+    """
+    Returns the hit and miss statistics of the parse caches.
+
+    Start times, durations and days of the week are each parsed through a
+    bounded LRU cache of PARSE_CACHE_SIZE entries.
+
+    Returns:
+        dict: The functools cache info of the 'start', 'duration' and 'day'
+            caches, with hits, misses, maxsize and currsize fields.
+    """
+    return {
+        'start': _parse_clock.cache_info(),
+        'duration': _parse_duration.cache_info(),
+        'day': _parse_day.cache_info(),
+    }
+
+def parse_cache_clear():
+    """
+    Empties the parse caches and resets their statistics.
+    """
+    _parse_clock.cache_clear()
+    _parse_duration.cache_clear()
+    _parse_day.cache_clear()
+
+
+@total_ordering
+class Duration:
+    __slots__ = ('_minutes',)
+
+    def __init__(self, minutes):
+        """
+        Initializes a Duration instance.
+
+        Parameters:
+            minutes (int): The length of the duration in minutes.
+        """
+        self._minutes = minutes
+
+    @classmethod
+    def parse(cls, duration):
+        """
+        Creates a Duration from a string in the format 'HH:MM'.
+
+        Parameters:
+            duration (str): The duration as a string in the format 'HH:MM'.
+
+        Returns:
+            Duration: The parsed duration.
+        """
+        return cls(_parse_duration(duration))
+
+    @property
+    def minutes(self):
+        """
+        int: The length of the duration in minutes.
+        """
+        return self._minutes
+
+    def __add__(self, other):
+        """
+        Adds two durations.
+
+        Parameters:
+            other (Duration): The duration to add.
+
+        Returns:
+            Duration: The sum of both durations.
+        """
+        if isinstance(other, Duration):
+            return Duration(self._minutes + other._minutes)
+        return NotImplemented
+
+    def __eq__(self, other):
+        if isinstance(other, Duration):
+            return self._minutes == other._minutes
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, Duration):
+            return self._minutes < other._minutes
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((Duration, self._minutes))
+
+    def __repr__(self):
+        return f'Duration({self._minutes})'
+
+    def __str__(self):
+        """
+        Returns the duration in the format 'HH:MM'.
+
+        Returns:
+            str: The duration as a string.
+        """
+        hours, minutes = divmod(self._minutes, 60)
+        return f'{hours}:{minutes:02d}'
+
+
+@total_ordering
+class TimeOfDay:
+    __slots__ = ('_minutes',)
+
+    def __init__(self, minutes):
+        """
+        Initializes a TimeOfDay instance.
+
+        Parameters:
+            minutes (int): The minutes since Monday 00:00. Values beyond a
+                week are kept as they are, so the number of days between two
+                instances can be recovered.
+        """
+        self._minutes = minutes
+
+    @classmethod
+    def parse(cls, start, day=''):
+        """
+        Creates a TimeOfDay from a string in the format 'HH:MM AM/PM'.
+
+        Parameters:
+            start (str): The time as a string in the format 'HH:MM AM/PM'.
+            day (str, optional): The day of the week (case-insensitive).
+                If not given, Monday is assumed.
+
+        Returns:
+            TimeOfDay: The parsed time.
+        """
+        day_index = _parse_day(day)
+        return cls(max(day_index, 0) * 1440 + _parse_clock(start))
+
+    @property
+    def minutes(self):
+        """
+        int: The minutes since Monday 00:00.
+        """
+        return self._minutes
+
+    @property
+    def day_index(self):
+        """
+        int: The index of the day of the week, where Monday is 0.
+        """
+        return (self._minutes // 1440) % 7
+
+    def __add__(self, other):
+        """
+        Adds a duration to the time.
+
+        Parameters:
+            other (Duration): The duration to add.
+
+        Returns:
+            TimeOfDay: The new time.
+        """
+        if isinstance(other, Duration):
+            return TimeOfDay(self._minutes + other._minutes)
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __eq__(self, other):
+        if isinstance(other, TimeOfDay):
+            return self._minutes == other._minutes
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, TimeOfDay):
+            return self._minutes < other._minutes
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((TimeOfDay, self._minutes))
+
+    def __repr__(self):
+        return f'TimeOfDay({self._minutes})'
+
+    def format(self, since=None, show_day=True):
+        """
+        Formats the time in the format returned by add_time.
+
+        Parameters:
+            since (TimeOfDay, optional): The time the days later are counted
+                from. If not given, the days later are not included.
+            show_day (bool, optional): Whether to include the day of the week.
+                Defaults to True.
+
+        Returns:
+            str: The time as 'HH:MM AM/PM, Day (n days later)'.
+        """
+        days = 0
+        if since is not None:
+            days = self._minutes // 1440 - since._minutes // 1440
+        return _format_time(self._minutes % 1440, days, self.day_index if show_day else -1)
+
+    def __str__(self):
+        """
+        Returns the time in the format 'HH:MM AM/PM, Day'.
+
+        Returns:
+            str: The time as a string.
+        """
+        return self.format()
 
 def add_time(start, duration, day = ''):
     """
@@ -45,53 +335,461 @@ def add_time(start, duration, day = ''):
         >>> add_time('3:30 PM', '2:12', 'Monday')
         '5:42 PM, Monday'
     """
-    array_time = start.split(' ')
-    total_time = array_time[0]
-    meridian = array_time[1]
-    array_total_time = total_time.split(':')
-    hours = array_total_time[0]
-    minutes = array_total_time[1]
-    duration_array = duration.split(':')
-    duration_hours = duration_array[0]
-    duration_minutes = duration_array[1]
-
-    hours = int(hours) + int(duration_hours)
-    minutes = int(minutes) + int(duration_minutes)
-
-    plus_hours = minutes // 60
-    minutes = minutes % 60
-    hours += plus_hours
-    days = hours // 24
-    hours = hours % 24
-
-    if hours >= 12:
-        if meridian == 'AM':
-            meridian = 'PM'
-        else:
-            meridian = 'AM'
-            days += 1
-        if hours > 12:
-            hours = hours % 12
+    start_time = TimeOfDay.parse(start, day)
+    new_time = start_time + Duration.parse(duration)
+    return new_time.format(since=start_time, show_day=bool(day))
 
-    minutes = str(minutes).zfill(2)
-    str_hours = f'{hours}:{minutes} {meridian}'
-    str_days = ''
-    if days == 1:
-        str_days += ' (next day)'
-    elif days > 1:
-        str_days += f' ({days} days later)'
-    new_time = ''
-    if day:
-        number_day = check_day(day.lower())
-        final_day = (number_day[1] + days) % 7
-        day_final = check_day(final_day)
-        day_name = day_final[0]
-        new_time = f'{str_hours}, {day_name}{str_days}'
+def add_time_batch(starts, durations, days=None):
+    """
+    Adds many durations to many times at once.
+
+    Every distinct start, duration and day string is parsed only once, the
+    arithmetic runs on integer minutes since Monday 00:00 and every distinct
+    result is formatted only once. When NumPy is installed the arithmetic is
+    vectorized over whole columns; otherwise it runs in a plain loop over the
+    parsed values.
+
+    Parameters:
+        starts (list or numpy.ndarray): The given times as strings in the
+            format 'HH:MM AM/PM'.
+        durations (list or numpy.ndarray): The durations to add as strings
+            in the format 'HH:MM'. Must have the same length as starts.
+        days (list or numpy.ndarray, optional): The given days of the week as
+            strings (case-insensitive). An empty string leaves the day out of
+            that result. If not given, no day is included in any result.
+
+    Returns:
+        list: The new times as strings, in the same format and order that
+            calling add_time on every row would return.
+
+    Raises:
+        ValueError: If the columns do not have the same length.
+
+    Example:
+        >>> add_time_batch(['3:30 PM', '11:43 AM'], ['2:12', '00:20'], ['Monday', ''])
+        ['5:42 PM, Monday', '12:03 PM']
+    """
+    if len(starts) != len(durations) or (days is not None and len(days) != len(starts)):
+        raise ValueError('All columns must have the same length')
+    if np is None:
+        return _add_time_batch_python(starts, durations, days)
+    return _add_time_batch_numpy(starts, durations, days)
+
+def _add_time_batch_python(starts, durations, days):
+    """
+    Pure Python implementation of add_time_batch.
+
+    Parameters:
+        starts (list): The given times as strings.
+        durations (list): The durations as strings.
+        days (list or None): The given days of the week as strings.
+
+    Returns:
+        list: The new times as strings.
+    """
+    parsed_starts = {}
+    parsed_durations = {}
+    parsed_days = {'': -1}
+    formatted = {}
+    if days is None:
+        days = [''] * len(starts)
+    results = []
+    for start, duration, day in zip(starts, durations, days):
+        if start not in parsed_starts:
+            parsed_starts[start] = _parse_clock(start)
+        if duration not in parsed_durations:
+            parsed_durations[duration] = _parse_duration(duration)
+        if day not in parsed_days:
+            parsed_days[day] = _parse_day(day)
+        days_later, minute_of_day = divmod(parsed_starts[start] + parsed_durations[duration], 1440)
+        day_index = parsed_days[day]
+        if day_index >= 0:
+            day_index = (day_index + days_later) % 7
+        key = (minute_of_day, days_later, day_index)
+        if key not in formatted:
+            formatted[key] = _format_time(*key)
+        results.append(formatted[key])
+    return results
+
+def _add_time_batch_numpy(starts, durations, days):
+    """
+    NumPy implementation of add_time_batch.
+
+    Parameters:
+        starts (list or numpy.ndarray): The given times as strings.
+        durations (list or numpy.ndarray): The durations as strings.
+        days (list, numpy.ndarray or None): The given days of the week as strings.
+
+    Returns:
+        list: The new times as strings.
+    """
+    if len(starts) == 0:
+        return []
+    start_codes, parsed = _factorize(starts, _parse_clock)
+    start_minutes = np.array(parsed, dtype=np.int64)[start_codes]
+
+    duration_codes, parsed = _factorize(durations, _parse_duration)
+    duration_minutes = np.array(parsed, dtype=np.int64)[duration_codes]
+
+    if days is None:
+        day_index = np.full(len(start_minutes), -1, dtype=np.int64)
     else:
-        new_time = f'{str_hours}{str_days}'
+        day_codes, parsed = _factorize(days, _parse_day)
+        day_index = np.array(parsed, dtype=np.int64)[day_codes]
+
+    days_later, minute_of_day = np.divmod(start_minutes + duration_minutes, 1440)
+    day_index = np.where(day_index >= 0, (day_index + days_later) % 7, 7)
+
+    # One integer per distinct output string, so formatting runs once per key.
+    keys = (days_later * 8 + day_index) * 1440 + minute_of_day
+    unique_keys, key_codes = np.unique(keys, return_inverse=True)
+    formatted = []
+    for key in unique_keys.tolist():
+        rest, key_minute = divmod(key, 1440)
+        key_days, key_day_index = divmod(rest, 8)
+        if key_day_index == 7:
+            key_day_index = -1
+        formatted.append(_format_time(key_minute, key_days, key_day_index))
+    return np.array(formatted, dtype=object)[key_codes.ravel()].tolist()
+
+def _factorize(values, parse):
+    """
+    Assigns an integer code to every distinct value and parses each one once.
+
+    Parameters:
+        values (list or numpy.ndarray): The strings to factorize.
+        parse (callable): The function used to parse a single string.
+
+    Returns:
+        tuple: A NumPy array with the code of every value and a list with the
+            parsed result of every code.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values),
+                        dtype=np.int64, count=len(values))
+    return (codes, [parse(str(value)) for value in index])
 
+class InvalidRecordError(ValueError):
 
-    return new_time
+    def __init__(self, line_number, line, reason):
+        """
+        Initializes an InvalidRecordError for a line that is not a valid record.
 
+        Parameters:
+            line_number (int): The number of the line, starting at 1.
+            line (str): The line.
+            reason (str): Why the line is not a valid record.
+        """
+        super().__init__(f'Line {line_number}: invalid record {line.rstrip()!r} ({reason})')
+        self.line_number = line_number
+        self.line = line
+        self.reason = reason
+
+def _parse_record(line):
+    """
+    Splits a line into a shift record and checks every field: the start time
+    needs hours from 1 to 12, minutes from 0 to 59 and AM or PM, and the
+    duration needs minutes from 0 to 59.
+
+    Parameters:
+        line (str): A non-empty line in the format 'start,duration[,day]'.
+
+    Returns:
+        tuple: The start time, the duration and the day of the week.
+
+    Raises:
+        ValueError: If the line is not a valid record.
+    """
+    fields = line.split(',')
+    if not 2 <= len(fields) <= 3:
+        raise ValueError('expected start,duration[,day]')
+    start = fields[0].strip()
+    duration = fields[1].strip()
+    day = fields[2].strip() if len(fields) > 2 else ''
+    clock, _, meridian = start.partition(' ')
+    hours, _, minutes = clock.partition(':')
+    if (meridian not in ('AM', 'PM') or not hours.isdecimal() or not minutes.isdecimal()
+            or not 1 <= int(hours) <= 12 or int(minutes) > 59):
+        raise ValueError(f'bad start time {start!r}')
+    hours, _, minutes = duration.partition(':')
+    if not hours.isdecimal() or not minutes.isdecimal() or int(minutes) > 59:
+        raise ValueError(f'bad duration {duration!r}')
+    if day and check_day(day.lower()) is None:
+        raise ValueError(f'bad day of the week {day!r}')
+    return (start, duration, day)
+
+def read_records(stream, skip_invalid=False):
+    """
+    Lazily reads shift records from a text stream.
+
+    Every non-empty line holds a record in the format 'start,duration[,day]',
+    for example '3:30 PM,2:12,Monday'. Lines are read one at a time, so the
+    whole input is never loaded into memory.
+
+    Parameters:
+        stream (file object): A text stream such as an open file or sys.stdin.
+        skip_invalid (bool, optional): If True, lines that are not valid
+            records, such as a header, are skipped. Defaults to False.
+
+    Yields:
+        tuple: The start time, the duration and the day of the week (an empty
+            string if the record has no day).
+
+    Raises:
+        InvalidRecordError: If a line is not a valid record and skip_invalid
+            is False. It is a ValueError that names the line number.
+    """
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield _parse_record(line)
+        except ValueError as error:
+            if not skip_invalid:
+                raise InvalidRecordError(line_number, line, str(error)) from None
+
+def add_time_stream(records, chunk_size=10000):
+    """
+    Adds the durations of a stream of records in chunks.
+
+    Only one chunk of records is held in memory at a time. Each chunk is
+    computed with add_time_batch.
+
+    Parameters:
+        records (iterable): Tuples of start time, duration and day of the week,
+            such as the ones yielded by read_records.
+        chunk_size (int, optional): The number of records per chunk.
+            Defaults to 10000.
+
+    Yields:
+        list: The new times of a chunk of records as strings, in input order.
+    """
+    starts = []
+    durations = []
+    days = []
+    for start, duration, day in records:
+        starts.append(start)
+        durations.append(duration)
+        days.append(day)
+        if len(starts) == chunk_size:
+            yield add_time_batch(starts, durations, days)
+            starts = []
+            durations = []
+            days = []
+    if starts:
+        yield add_time_batch(starts, durations, days)
+
+def process_stream(input_stream, output_stream, chunk_size=10000, skip_invalid=False):
+    """
+    Reads shift records from a stream and writes one new time per line.
 
-print(add_time('3:30 PM', '2:12', 'Monday'))
\ No newline at end of file
+    Parameters:
+        input_stream (file object): The text stream to read records from.
+        output_stream (file object): The text stream to write results to.
+        chunk_size (int, optional): The number of records per chunk.
+            Defaults to 10000.
+        skip_invalid (bool, optional): If True, invalid lines are skipped
+            instead of raising InvalidRecordError. Defaults to False.
+
+    Returns:
+        int: The number of records processed.
+
+    Raises:
+        InvalidRecordError: If a line is not a valid record and skip_invalid
+            is False.
+    """
+    count = 0
+    for chunk in add_time_stream(read_records(input_stream, skip_invalid), chunk_size):
+        output_stream.write('\n'.join(chunk))
+        output_stream.write('\n')
+        count += len(chunk)
+    return count
+
+def process_file(input_path, output_path, chunk_size=10000, buffer_size=1 << 20, skip_invalid=False):
+    """
+    Processes a file of shift records with buffered reads and writes.
+
+    Parameters:
+        input_path (str): The path of the input file, or '-' for stdin.
+        output_path (str): The path of the output file, or '-' for stdout.
+        chunk_size (int, optional): The number of records per chunk.
+            Defaults to 10000.
+        buffer_size (int, optional): The size in bytes of the I/O buffers.
+            Defaults to 1 MiB.
+        skip_invalid (bool, optional): If True, invalid lines are skipped
+            instead of raising InvalidRecordError. Defaults to False.
+
+    Returns:
+        int: The number of records processed.
+
+    Raises:
+        InvalidRecordError: If a line is not a valid record and skip_invalid
+            is False.
+    """
+    if input_path == '-':
+        input_stream = sys.stdin
+    else:
+        input_stream = open(input_path, 'r', buffering=buffer_size)
+    if output_path == '-':
+        output_stream = sys.stdout
+    else:
+        output_stream = open(output_path, 'w', buffering=buffer_size)
+    try:
+        count = process_stream(input_stream, output_stream, chunk_size, skip_invalid)
+        output_stream.flush()
+    finally:
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    return count
+
+def split_file(path, shard_size):
+    """
+    Splits a file into byte ranges that start and end on line boundaries.
+
+    Parameters:
+        path (str): The path of the file.
+        shard_size (int): The approximate size in bytes of every range.
+
+    Returns:
+        list: Tuples with the start and end byte offsets of every range, in
+            file order.
+    """
+    file_size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as stream:
+        start = 0
+        while start < file_size:
+            end = start + shard_size
+            if end < file_size:
+                stream.seek(end)
+                stream.readline()
+                end = stream.tell()
+            else:
+                end = file_size
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def _process_range(task):
+    """
+    Processes the records in one byte range of a file.
+
+    Parameters:
+        task (tuple): The path of the file, the start and end byte offsets,
+            the number of records per chunk and whether to skip invalid lines.
+
+    Returns:
+        tuple: The number of records processed, their new times as text, one
+            per line, the number of lines in the range and, if a line is not
+            a valid record, its line number within the range, the line and
+            the reason, or None.
+    """
+    path, start, end, chunk_size, skip_invalid = task
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        lines = list(io.StringIO(stream.read(end - start).decode(), newline=None))
+    output = []
+    count = 0
+    try:
+        for chunk in add_time_stream(read_records(lines, skip_invalid), chunk_size):
+            output.append('\n'.join(chunk))
+            output.append('\n')
+            count += len(chunk)
+    except InvalidRecordError as error:
+        return (count, ''.join(output), len(lines), (error.line_number, error.line, error.reason))
+    return (count, ''.join(output), len(lines), None)
+
+def _imap_window(pool, function, tasks, window):
+    """
+    Runs tasks on a pool like Pool.imap, but submits a task only when fewer
+    than window results are waiting to be consumed.
+
+    Parameters:
+        pool (multiprocessing.Pool): The pool.
+        function (callable): The function to run on every task.
+        tasks (iterable): The tasks.
+        window (int): The largest number of tasks submitted and not consumed.
+
+    Yields:
+        object: The result of every task, in order.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= window:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(function, (task,)))
+    while pending:
+        yield pending.popleft().get()
+
+def process_file_parallel(input_path, output_path, workers=None, shard_size=1 << 24,
+                          chunk_size=10000, buffer_size=1 << 20, skip_invalid=False):
+    """
+    Processes a file of shift records on several processes.
+
+    The input file is split into byte ranges of about shard_size bytes that
+    are processed by a pool of worker processes. Results are written in input
+    order as soon as every preceding range is done, and a range is only
+    handed to the pool when fewer than two per worker are waiting to be
+    written, so a slow output holds at most that many ranges in memory.
+    Lines are split the same way as in process_file.
+
+    Parameters:
+        input_path (str): The path of the input file. Must be a regular file.
+        output_path (str): The path of the output file, or '-' for stdout.
+        workers (int, optional): The number of worker processes. Defaults to
+            the number of CPUs. With 1 worker everything runs in this process.
+        shard_size (int, optional): The approximate size in bytes of every
+            range. Defaults to 16 MiB.
+        chunk_size (int, optional): The number of records per chunk inside a
+            range. Defaults to 10000.
+        buffer_size (int, optional): The size in bytes of the output buffer.
+            Defaults to 1 MiB.
+        skip_invalid (bool, optional): If True, invalid lines are skipped
+            instead of raising InvalidRecordError. Defaults to False.
+
+    Returns:
+        int: The number of records processed.
+
+    Raises:
+        InvalidRecordError: If a line is not a valid record and skip_invalid
+            is False. The results of the lines before it are written.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = [(input_path, start, end, chunk_size, skip_invalid)
+             for start, end in split_file(input_path, shard_size)]
+    if output_path == '-':
+        output_stream = sys.stdout
+    else:
+        output_stream = open(output_path, 'w', buffering=buffer_size)
+    pool = Pool(workers) if workers > 1 else None
+    count = 0
+    lines_before = 0
+    try:
+        if pool:
+            results = _imap_window(pool, _process_range, tasks, 2 * workers)
+        else:
+            results = map(_process_range, tasks)
+        for range_count, text, range_lines, invalid in results:
+            output_stream.write(text)
+            count += range_count
+            if invalid is not None:
+                line_number, line, reason = invalid
+                raise InvalidRecordError(lines_before + line_number, line, reason)
+            lines_before += range_lines
+        output_stream.flush()
+    finally:
+        if pool:
+            pool.terminate()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        process_file(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else '-')
+    else:
+        print(add_time('3:30 PM', '2:12', 'Monday'))
\ No newline at end of file